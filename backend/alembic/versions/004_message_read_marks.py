@@ -0,0 +1,63 @@
+"""Replace per-message read rows with per-(user, activity, sender) high-water marks
+
+Revision ID: 004_message_read_marks
+Revises: 003_friend_notifications
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_message_read_marks'
+down_revision = '003_friend_notifications'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'message_read_marks' not in tables:
+        op.create_table(
+            'message_read_marks',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('activity_id', sa.Integer(), nullable=False),
+            sa.Column('sender_id', sa.Integer(), nullable=False),
+            sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('user_id', 'activity_id', 'sender_id'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['activity_id'], ['activities.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ondelete='CASCADE')
+        )
+
+    # Comprimă rândurile existente: un mark per (cititor, activitate, expeditor) cu cel mai mare mesaj citit
+    op.execute("""
+        INSERT INTO message_read_marks (user_id, activity_id, sender_id, last_read_message_id, updated_at)
+        SELECT rn.user_id, m.activity_id, m.sender_id, MAX(m.id), MAX(rn.read_at)
+        FROM read_notifications rn
+        JOIN messages m ON m.id = rn.notification_id
+        WHERE rn.notification_type = 'new_message'
+        GROUP BY rn.user_id, m.activity_id, m.sender_id
+        ON CONFLICT (user_id, activity_id, sender_id) DO UPDATE
+        SET last_read_message_id = GREATEST(message_read_marks.last_read_message_id,
+                                            EXCLUDED.last_read_message_id)
+    """)
+    op.execute("DELETE FROM read_notifications WHERE notification_type = 'new_message'")
+
+
+def downgrade() -> None:
+    # Reconstruiește câte un rând per mesaj citit
+    op.execute("""
+        INSERT INTO read_notifications (user_id, notification_type, notification_id, activity_id, read_at)
+        SELECT mk.user_id, 'new_message', m.id, m.activity_id, mk.updated_at
+        FROM message_read_marks mk
+        JOIN messages m
+            ON m.activity_id = mk.activity_id
+            AND m.sender_id = mk.sender_id
+            AND m.id <= mk.last_read_message_id
+    """)
+    op.drop_table('message_read_marks')
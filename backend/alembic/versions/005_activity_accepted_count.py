@@ -0,0 +1,49 @@
+"""Add accepted_count to activities
+
+Revision ID: 005_activity_accepted_count
+Revises: 004_message_read_marks
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_activity_accepted_count'
+down_revision = '004_message_read_marks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [col['name'] for col in inspector.get_columns('activities')]
+
+    if 'accepted_count' not in columns:
+        op.add_column('activities',
+            sa.Column('accepted_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Inițializează contorul din participările acceptate existente
+    op.execute("""
+        UPDATE activities a
+        SET accepted_count = sub.cnt
+        FROM (
+            SELECT activity_id, COUNT(*) AS cnt
+            FROM participations
+            WHERE status = 'ACCEPTED'
+            GROUP BY activity_id
+        ) sub
+        WHERE sub.activity_id = a.id
+    """)
+
+    op.create_check_constraint(
+        'ck_activities_accepted_count_non_negative',
+        'activities',
+        'accepted_count >= 0'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('ck_activities_accepted_count_non_negative', 'activities', type_='check')
+    op.drop_column('activities', 'accepted_count')
@@ -0,0 +1,52 @@
+"""Add symmetric friendships adjacency table
+
+Revision ID: 006_friendships
+Revises: 005_activity_accepted_count
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_friendships'
+down_revision = '005_activity_accepted_count'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'friendships' not in tables:
+        # Cheia primară (user_id, friend_id) servește direct listele și numărătorile de prieteni
+        op.create_table(
+            'friendships',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('friend_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('user_id', 'friend_id'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['friend_id'], ['users.id'], ondelete='CASCADE')
+        )
+
+    # Populează din cererile acceptate, în ambele direcții
+    op.execute("""
+        INSERT INTO friendships (user_id, friend_id, created_at)
+        SELECT from_user_id, to_user_id, created_at FROM friend_requests WHERE status = 'ACCEPTED'
+        UNION ALL
+        SELECT to_user_id, from_user_id, created_at FROM friend_requests WHERE status = 'ACCEPTED'
+        ON CONFLICT (user_id, friend_id) DO NOTHING
+    """)
+
+    # Căutarea cererii dintre doi utilizatori (ambele direcții) devine BitmapOr pe acest index
+    indexes = [idx['name'] for idx in inspector.get_indexes('friend_requests')]
+    if 'ix_friend_requests_from_to' not in indexes:
+        op.create_index('ix_friend_requests_from_to', 'friend_requests', ['from_user_id', 'to_user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_friend_requests_from_to', table_name='friend_requests')
+    op.drop_table('friendships')
@@ -0,0 +1,46 @@
+"""Add precomputed friend_suggestions table
+
+Revision ID: 007_friend_suggestions
+Revises: 006_friendships
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_friend_suggestions'
+down_revision = '006_friendships'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'friend_suggestions' not in tables:
+        op.create_table(
+            'friend_suggestions',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('candidate_id', sa.Integer(), nullable=False),
+            sa.Column('score', sa.Float(), nullable=False),
+            sa.Column('mutual_friends', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('shared_interests', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('distance_km', sa.Float(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('user_id', 'candidate_id'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['candidate_id'], ['users.id'], ondelete='CASCADE')
+        )
+        # Sugestiile unui utilizator sunt citite ordonate după scor
+        op.create_index('ix_friend_suggestions_user_score', 'friend_suggestions', ['user_id', 'score'], unique=False)
+        # Invalidarea incrementală caută după candidat
+        op.create_index('ix_friend_suggestions_candidate_id', 'friend_suggestions', ['candidate_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_friend_suggestions_candidate_id', table_name='friend_suggestions')
+    op.drop_index('ix_friend_suggestions_user_score', table_name='friend_suggestions')
+    op.drop_table('friend_suggestions')
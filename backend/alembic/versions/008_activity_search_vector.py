@@ -0,0 +1,69 @@
+"""Add full-text search vector (Romanian + English, unaccented) to activities
+
+Revision ID: 008_activity_search_vector
+Revises: 007_friend_suggestions
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '008_activity_search_vector'
+down_revision = '007_friend_suggestions'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_EXPRESSION = """
+    setweight(to_tsvector('romanian', se_unaccent(coalesce({row}title, ''))), 'A') ||
+    setweight(to_tsvector('english', se_unaccent(coalesce({row}title, ''))), 'A') ||
+    setweight(to_tsvector('romanian', se_unaccent(coalesce({row}description, ''))), 'B') ||
+    setweight(to_tsvector('english', se_unaccent(coalesce({row}description, ''))), 'B')
+"""
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+
+    # unaccent() nu este IMMUTABLE; wrapper-ul cu dicționar explicit poate fi folosit în index-uri
+    op.execute("""
+        CREATE OR REPLACE FUNCTION se_unaccent(text) RETURNS text AS $$
+            SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+        $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """)
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [col['name'] for col in inspector.get_columns('activities')]
+    if 'search_vector' not in columns:
+        op.add_column('activities', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Vectorul este menținut la scriere de un trigger (doar când se schimbă titlul/descrierea)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION activities_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_EXPRESSION.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS activities_search_vector_trigger ON activities")
+    op.execute("""
+        CREATE TRIGGER activities_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description ON activities
+        FOR EACH ROW EXECUTE FUNCTION activities_search_vector_update()
+    """)
+
+    op.execute(f"UPDATE activities SET search_vector = {SEARCH_VECTOR_EXPRESSION.format(row='')}")
+
+    op.create_index('ix_activities_search_vector', 'activities', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activities_search_vector', table_name='activities')
+    op.execute("DROP TRIGGER IF EXISTS activities_search_vector_trigger ON activities")
+    op.execute("DROP FUNCTION IF EXISTS activities_search_vector_update()")
+    op.drop_column('activities', 'search_vector')
+    op.execute("DROP FUNCTION IF EXISTS se_unaccent(text)")
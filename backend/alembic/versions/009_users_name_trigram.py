@@ -0,0 +1,27 @@
+"""Add trigram index for fuzzy user name search
+
+Revision ID: 009_users_name_trigram
+Revises: 008_activity_search_vector
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '009_users_name_trigram'
+down_revision = '008_activity_search_vector'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Index pe numele normalizat (lowercase, fără diacritice), la fel ca interogarea din /api/search/users
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_users_name_trgm
+        ON users USING gin (se_unaccent(lower(name)) gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_users_name_trgm")
@@ -0,0 +1,119 @@
+"""Partition messages by month, partial indexes for upcoming public activities
+
+Revision ID: 010_partition_messages
+Revises: 009_users_name_trigram
+Create Date: 2026-10-19
+
+"""
+from datetime import date, datetime
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010_partition_messages'
+down_revision = '009_users_name_trigram'
+branch_labels = None
+depends_on = None
+
+# Partiții create în avans (luni), restul sunt create de jobul de mentenanță
+MONTHS_AHEAD = 3
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Activitățile nu pot fi partiționate după start_time: participations, messages și
+    # message_read_marks au chei străine spre activities.id, iar cheia primară a unei tabele
+    # partiționate trebuie să includă coloana de partiționare. Index-urile parțiale țin
+    # scanările pe activitățile publice
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_activities_public_start_time
+        ON activities (start_time) WHERE is_public
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_activities_public_location
+        ON activities USING gist (location) WHERE is_public
+    """)
+
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('messages')")).scalar()
+    if relkind == 'p':
+        return
+
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('messages', 'id')")).scalar()
+    first = bind.execute(sa.text("SELECT MIN(created_at) FROM messages")).scalar()
+
+    op.execute("ALTER TABLE messages RENAME TO messages_unpartitioned")
+    op.execute("ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_messages_id")
+    # Secvența ar fi ștearsă odată cu tabela veche
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    # Cheia primară include coloana de partiționare
+    op.execute(f"""
+        CREATE TABLE messages (
+            id integer NOT NULL DEFAULT nextval('{sequence}'::regclass),
+            activity_id integer NOT NULL REFERENCES activities (id),
+            sender_id integer NOT NULL REFERENCES users (id),
+            text text NOT NULL,
+            created_at timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY messages.id")
+    op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+
+    month = (first or datetime.utcnow()).date().replace(day=1)
+    last = _add_months(datetime.utcnow().date().replace(day=1), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE messages_p{month:%Y%m} PARTITION OF messages "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+
+    op.execute("""
+        INSERT INTO messages (id, activity_id, sender_id, text, created_at)
+        SELECT id, activity_id, sender_id, text, COALESCE(created_at, now() AT TIME ZONE 'utc')
+        FROM messages_unpartitioned
+    """)
+    op.execute("DROP TABLE messages_unpartitioned")
+    op.create_index('ix_messages_activity_created', 'messages', ['activity_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.execute("DROP INDEX IF EXISTS ix_activities_public_location")
+    op.execute("DROP INDEX IF EXISTS ix_activities_public_start_time")
+
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('messages')")).scalar()
+    if relkind != 'p':
+        return
+
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('messages', 'id')")).scalar()
+    op.execute("ALTER TABLE messages RENAME TO messages_partitioned")
+    op.execute("ALTER TABLE messages_partitioned RENAME CONSTRAINT messages_pkey TO messages_partitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_messages_activity_created")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute(f"""
+        CREATE TABLE messages (
+            id integer NOT NULL DEFAULT nextval('{sequence}'::regclass),
+            activity_id integer NOT NULL REFERENCES activities (id),
+            sender_id integer NOT NULL REFERENCES users (id),
+            text text NOT NULL,
+            created_at timestamp without time zone,
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY messages.id")
+    # Partițiile arhivate (detașate) nu mai fac parte din tabelă și nu sunt copiate
+    op.execute("""
+        INSERT INTO messages (id, activity_id, sender_id, text, created_at)
+        SELECT id, activity_id, sender_id, text, created_at FROM messages_partitioned
+    """)
+    op.execute("DROP TABLE messages_partitioned")
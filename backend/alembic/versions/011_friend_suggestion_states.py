@@ -0,0 +1,46 @@
+"""Add friend_suggestion_states (computed-at marker and stale flag)
+
+Revision ID: 011_friend_suggestion_states
+Revises: 010_partition_messages
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_friend_suggestion_states'
+down_revision = '010_partition_messages'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'friend_suggestion_states' not in tables:
+        op.create_table(
+            'friend_suggestion_states',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('computed_at', sa.DateTime(), nullable=True),
+            sa.Column('stale', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.PrimaryKeyConstraint('user_id'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE')
+        )
+        # Jobul de mentenanță parcurge doar utilizatorii marcați
+        op.create_index(
+            'ix_friend_suggestion_states_stale', 'friend_suggestion_states', ['user_id'],
+            unique=False, postgresql_where=sa.text('stale')
+        )
+        # Utilizatorii care au deja sugestii au fost calculați
+        op.execute("""
+            INSERT INTO friend_suggestion_states (user_id, computed_at, stale)
+            SELECT user_id, MAX(updated_at), false FROM friend_suggestions GROUP BY user_id
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_friend_suggestion_states_stale', table_name='friend_suggestion_states')
+    op.drop_table('friend_suggestion_states')
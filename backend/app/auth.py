@@ -4,6 +4,7 @@ from jose import JWTError, jwt
 import bcrypt
 import os
 from dotenv import load_dotenv
+from app.metrics import PASSWORD_HASH_DURATION
 
 load_dotenv()
 
@@ -14,13 +15,15 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifică parola"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    with PASSWORD_HASH_DURATION.labels("verify").time():
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
 def get_password_hash(password: str) -> str:
     """Generează hash pentru parolă"""
     salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    with PASSWORD_HASH_DURATION.labels("hash").time():
+        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
@@ -0,0 +1,327 @@
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from app.coalesce import single_flight
+from app.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# memory = LRU per worker; redis = cache partajat între workeri (orice server care vorbește RESP)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/1")
+# Prefixul tuturor cheilor (mai multe medii pot împărți același Redis)
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "se")
+# Numărul maxim de intrări în backend-ul din memorie (LRU)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "20000"))
+# Cât așteaptă un worker rezultatul calculat de alt worker care ține lock-ul (secunde)
+CACHE_LOCK_WAIT_SECONDS = float(os.getenv("CACHE_LOCK_WAIT_SECONDS", "2"))
+# Durata maximă a unui lock de recalculare (un worker căzut nu blochează cheia mai mult)
+CACHE_LOCK_TTL_SECONDS = float(os.getenv("CACHE_LOCK_TTL_SECONDS", "10"))
+
+_LOCK_POLL_SECONDS = 0.05
+_DIGITS = re.compile(r"\d+")
+
+
+class MemoryCacheBackend:
+    """LRU cu TTL în memoria procesului. Valorile nu sunt copiate: apelanții nu trebuie să le modifice"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Versiunile tag-urilor nu intră în LRU: o versiune pierdută ar reactiva intrări invalidate
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys: list) -> list:
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items: dict, ttl_seconds: float) -> None:
+        for key, value in items.items():
+            self.set(key, value, ttl_seconds)
+
+    def add(self, key: str, value, ttl_seconds: float) -> bool:
+        """Setează cheia doar dacă nu există (lock-uri); True dacă a fost setată"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return False
+            self._entries[key] = (now + ttl_seconds, value)
+            return True
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def counters(self, keys: list) -> list:
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+
+class RedisCacheBackend:
+    """Cache partajat prin protocolul Redis (RESP); valorile sunt serializate cu pickle.
+    La erori de conexiune cache-ul se comportă ca gol, iar cererile merg la baza de date"""
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        import redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def _call(self, default, method, *args, **kwargs):
+        try:
+            return getattr(self._client, method)(*args, **kwargs)
+        except Exception:
+            logger.warning("Backend-ul Redis pentru cache nu răspunde (%s)", method, exc_info=True)
+            return default
+
+    def get(self, key: str):
+        raw = self._call(None, "get", key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl_seconds: float) -> None:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._call(None, "set", key, payload, px=max(1, int(ttl_seconds * 1000)))
+
+    def get_many(self, keys: list) -> list:
+        if not keys:
+            return []
+        values = self._call(None, "mget", keys)
+        if values is None:
+            return [None] * len(keys)
+        return [pickle.loads(raw) if raw is not None else None for raw in values]
+
+    def set_many(self, items: dict, ttl_seconds: float) -> None:
+        if not items:
+            return
+        pipeline = self._client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                         px=max(1, int(ttl_seconds * 1000)))
+        try:
+            pipeline.execute()
+        except Exception:
+            logger.warning("Backend-ul Redis pentru cache nu răspunde (set_many)", exc_info=True)
+
+    def add(self, key: str, value, ttl_seconds: float) -> bool:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        # Dacă Redis nu răspunde, fiecare worker calculează singur (ca fără lock)
+        return bool(self._call(True, "set", key, payload, px=max(1, int(ttl_seconds * 1000)), nx=True))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._call(None, "delete", *keys)
+
+    def counters(self, keys: list) -> list:
+        if not keys:
+            return []
+        values = self._call(None, "mget", keys)
+        if values is None:
+            # Versiuni necunoscute: intrarea este tratată ca invalidată
+            return [None] * len(keys)
+        return [int(v) if v is not None else 0 for v in values]
+
+    def incr(self, key: str) -> int:
+        return self._call(0, "incr", key)
+
+    def clear(self, prefix: str) -> None:
+        try:
+            keys = list(self._client.scan_iter(prefix + "*"))
+        except Exception:
+            logger.warning("Backend-ul Redis pentru cache nu răspunde (scan)", exc_info=True)
+            return
+        for start in range(0, len(keys), 500):
+            self.delete(*keys[start:start + 500])
+
+
+BACKENDS = {
+    "memory": MemoryCacheBackend,
+    "redis": RedisCacheBackend,
+}
+
+cache_backend = BACKENDS[CACHE_BACKEND]()
+
+
+def _tag_key(tag: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:tag:{tag}"
+
+
+def _tag_family(tag: str) -> str:
+    """Familia unui tag (id-urile înlocuite cu '*'): user:7 -> user:*"""
+    return _DIGITS.sub("*", tag)
+
+
+def invalidate_tags(*tags: str) -> None:
+    """Invalidează toate intrările (din orice namespace) marcate cu unul dintre tag-uri.
+    Se apelează după commit, din căile de scriere"""
+    for tag in dict.fromkeys(tags):
+        cache_backend.incr(_tag_key(tag))
+    # Versiunea familiei semnalează calculelor în curs că un tag din valoare s-a schimbat (vezi Cache._fill)
+    for family in dict.fromkeys(_tag_family(tag) for tag in tags):
+        if family not in tags:
+            cache_backend.incr(_tag_key(family))
+
+
+class Cache:
+    """Un namespace de cache peste backend-ul comun: chei cu prefix, TTL, invalidare prin tag-uri
+    (versiuni), protecție la stampede (single-flight în worker + lock între workeri) și metrici hit/miss"""
+
+    def __init__(self, namespace: str, ttl_seconds: float, backend=None, value_tag_families=()):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend or cache_backend
+        # Familiile tag-urilor calculate din valoare (ex. "user:*"); cele nedeclarate sunt învățate la primul calcul
+        self._value_families = set(value_tag_families)
+
+    def key(self, key) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([CACHE_KEY_PREFIX, self.namespace, *(str(part) for part in parts)])
+
+    def _versions(self, tags) -> dict:
+        tags = list(dict.fromkeys(tags))
+        return dict(zip(tags, self.backend.counters([_tag_key(tag) for tag in tags])))
+
+    def _fresh(self, entry):
+        """(True, valoare) dacă intrarea există și niciun tag nu a fost invalidat de la scriere"""
+        if entry is None:
+            return False, None
+        value, versions = entry
+        if versions:
+            current = self._versions(versions)
+            if any(current[tag] is None or current[tag] != version for tag, version in versions.items()):
+                return False, None
+        return True, value
+
+    def _lookup(self, key):
+        return self._fresh(self.backend.get(self.key(key)))
+
+    def get_many(self, keys) -> dict:
+        """{cheie: valoare} pentru intrările găsite, cu o singură citire din backend"""
+        keys = list(keys)
+        found = {}
+        for key, entry in zip(keys, self.backend.get_many([self.key(key) for key in keys])):
+            hit, value = self._fresh(entry)
+            if hit:
+                found[key] = value
+        record_cache(self.namespace, True, len(found))
+        record_cache(self.namespace, False, len(keys) - len(found))
+        return found
+
+    def set_many(self, items: dict, ttl_seconds: float = None) -> None:
+        """Scrie mai multe intrări fără tag-uri (cache-uri invalidate explicit, cu delete)"""
+        self.backend.set_many(
+            {self.key(key): (value, {}) for key, value in items.items()}, ttl_seconds or self.ttl_seconds
+        )
+
+    def get(self, key, default=None):
+        found, value = self._lookup(key)
+        record_cache(self.namespace, found)
+        return value if found else default
+
+    def set(self, key, value, tags=(), ttl_seconds: float = None, versions: dict = None) -> None:
+        """Scrie valoarea; `versions` sunt versiunile tag-urilor citite înainte de calcul"""
+        if versions is None:
+            versions = self._versions(tags)
+        else:
+            versions = {**self._versions(t for t in tags if t not in versions), **versions}
+        if any(version is None for version in versions.values()):
+            return
+        self.backend.set(self.key(key), (value, versions), ttl_seconds or self.ttl_seconds)
+
+    def delete(self, *keys) -> None:
+        self.backend.delete(*(self.key(key) for key in keys))
+
+    def get_or_set(self, key, load, tags=(), value_tags=None, ttl_seconds: float = None):
+        """Valoarea din cache sau load(); `tags` sunt cunoscute înainte de calcul, `value_tags(valoare)`
+        întoarce tag-uri care depind de rezultat (ex. utilizatorii care apar în el)"""
+        found, value = self._lookup(key)
+        record_cache(self.namespace, found)
+        if found:
+            return value
+        # Cererile simultane din același worker așteaptă un singur calcul
+        return single_flight.do(
+            f"cache:{self.namespace}", key,
+            lambda: self._fill(key, load, tags, value_tags, ttl_seconds)
+        )
+
+    async def get_or_set_async(self, key, load, tags=(), value_tags=None, ttl_seconds: float = None):
+        """Varianta pentru endpoint-uri async: calculul rulează în threadpool"""
+        found, value = self._lookup(key)
+        record_cache(self.namespace, found)
+        if found:
+            return value
+        return await single_flight.do_async(
+            f"cache:{self.namespace}", key,
+            lambda: self._fill(key, load, tags, value_tags, ttl_seconds)
+        )
+
+    def _fill(self, key, load, tags, value_tags, ttl_seconds):
+        lock_key = self.key(key) + ":lock"
+        locked = self.backend.add(lock_key, 1, CACHE_LOCK_TTL_SECONDS)
+        if not locked:
+            # Alt worker calculează aceeași cheie: îi așteptăm rezultatul, apoi calculăm oricum
+            deadline = time.monotonic() + CACHE_LOCK_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(_LOCK_POLL_SECONDS)
+                found, value = self._lookup(key)
+                if found:
+                    return value
+        try:
+            # Versiunile sunt citite înainte de calcul: o scriere în timpul calculului invalidează rezultatul.
+            # Tag-urile din valoare nu sunt cunoscute încă, așa că se citesc versiunile familiilor lor
+            families = tuple(self._value_families)
+            versions = self._versions(tags)
+            family_versions = self._versions(families)
+            value = load()
+            if value_tags:
+                extra = tuple(value_tags(value))
+                new_families = {_tag_family(tag) for tag in extra} - self._value_families
+                # Versiunile tag-urilor din valoare sunt citite înainte de verificarea familiilor: o scriere
+                # după verificare le incrementează, deci intrarea scrisă devine oricum invalidă
+                versions = {**self._versions(t for t in extra if t not in versions), **versions}
+                if new_families or self._versions(families) != family_versions:
+                    # Familie nouă (fără versiune de dinainte) sau un tag din familie schimbat în timpul
+                    # calculului: rezultatul este servit, dar nu este scris în cache
+                    self._value_families |= new_families
+                    return value
+            self.set(key, value, (), ttl_seconds, versions)
+            return value
+        finally:
+            if locked:
+                self.backend.delete(lock_key)
+
+    def clear(self) -> None:
+        self.backend.clear(f"{CACHE_KEY_PREFIX}:{self.namespace}:")
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from starlette.concurrency import run_in_threadpool
+from app.metrics import COALESCED_REQUESTS
+
+# Zecimalele păstrate la normalizarea parametrilor float (~0.1 m pentru coordonate)
+KEY_FLOAT_DIGITS = 6
+
+
+def coalesce_key(*parts) -> tuple:
+    """Cheie normalizată din parametrii cererii (float-urile rotunjite, string-urile fără spații)"""
+    normalized = []
+    for part in parts:
+        if isinstance(part, float):
+            part = round(part, KEY_FLOAT_DIGITS) + 0.0
+        elif isinstance(part, str):
+            part = part.strip()
+        normalized.append(part)
+    return tuple(normalized)
+
+
+class SingleFlight:
+    """Cererile identice simultane împart un singur calcul: primul apelant (leader) îl execută,
+    ceilalți așteaptă același rezultat (sau aceeași excepție). Rezultatul nu este păstrat după
+    ce calculul se termină - nu este un cache"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, name: str, key) -> tuple:
+        """(future, True dacă apelantul este leader)"""
+        with self._lock:
+            future = self._calls.get((name, key))
+            if future is not None:
+                COALESCED_REQUESTS.labels(name, "follower").inc()
+                return future, False
+            future = Future()
+            self._calls[(name, key)] = future
+        COALESCED_REQUESTS.labels(name, "leader").inc()
+        return future, True
+
+    def _finish(self, name: str, key, future: Future, fn) -> None:
+        try:
+            future.set_result(fn())
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                self._calls.pop((name, key), None)
+
+    def do(self, name: str, key, fn):
+        """Varianta sincronă: fiecare apelant care așteaptă ține un thread; endpoint-urile folosesc do_async"""
+        future, leader = self._join(name, key)
+        if leader:
+            self._finish(name, key, future, fn)
+        return future.result()
+
+    async def do_async(self, name: str, key, fn):
+        """Varianta async: calculul (sincron, cu query-uri) rulează în threadpool, nu în event loop"""
+        future, leader = self._join(name, key)
+        if leader:
+            await run_in_threadpool(self._finish, name, key, future, fn)
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+single_flight = SingleFlight()
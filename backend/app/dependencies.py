@@ -1,3 +1,4 @@
+import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -7,6 +8,9 @@ from app.auth import decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
+# Email-urile administratorilor (separate prin virgulă)
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
 
 def get_current_user(
     token: str = Depends(oauth2_scheme),
@@ -30,5 +34,11 @@ def get_current_user(
     return user
 
 
-
-
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Obține utilizatorul curent, doar dacă este administrator (ADMIN_EMAILS)"""
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acces permis doar administratorilor"
+        )
+    return current_user
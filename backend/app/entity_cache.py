@@ -0,0 +1,66 @@
+import os
+from collections import namedtuple
+from sqlalchemy.orm import Session
+from app.cache import Cache
+from app.models import User, Activity
+
+# Cât timp sunt păstrate proiecțiile (secunde); modificările le invalidează explicit
+ENTITY_CACHE_TTL_SECONDS = float(os.getenv("ENTITY_CACHE_TTL_SECONDS", "600"))
+
+# Proiecțiile folosite pentru nume și verificări de acces (nu obiecte ORM, sunt împărțite între cereri)
+UserBrief = namedtuple("UserBrief", "id name")
+ActivityBrief = namedtuple("ActivityBrief", "id title creator_id")
+
+user_briefs = Cache("user_brief", ENTITY_CACHE_TTL_SECONDS)
+activity_briefs = Cache("activity_brief", ENTITY_CACHE_TTL_SECONDS)
+
+
+def _get_many(cache: Cache, ids, load) -> dict:
+    """Read-through: intrările lipsă sunt încărcate cu un singur query și scrise înapoi"""
+    ids = {entity_id for entity_id in ids if entity_id is not None}
+    if not ids:
+        return {}
+    found = cache.get_many(ids)
+    missing = ids - found.keys()
+    if missing:
+        loaded = {brief.id: brief for brief in load(missing)}
+        cache.set_many(loaded)
+        found.update(loaded)
+    return found
+
+
+def get_users(db: Session, user_ids) -> dict:
+    """{id: UserBrief} pentru utilizatorii existenți dintre `user_ids`"""
+    return _get_many(user_briefs, user_ids, lambda missing: [
+        UserBrief(*row) for row in db.query(User.id, User.name).filter(User.id.in_(missing)).all()
+    ])
+
+
+def get_user(db: Session, user_id):
+    return get_users(db, (user_id,)).get(user_id)
+
+
+def user_name(db: Session, user_id):
+    """Numele utilizatorului sau None dacă nu există"""
+    brief = get_user(db, user_id)
+    return brief.name if brief else None
+
+
+def get_activities(db: Session, activity_ids) -> dict:
+    """{id: ActivityBrief} pentru activitățile existente dintre `activity_ids`"""
+    return _get_many(activity_briefs, activity_ids, lambda missing: [
+        ActivityBrief(*row) for row in db.query(Activity.id, Activity.title, Activity.creator_id)
+        .filter(Activity.id.in_(missing)).all()
+    ])
+
+
+def get_activity(db: Session, activity_id):
+    return get_activities(db, (activity_id,)).get(activity_id)
+
+
+def invalidate_user(user_id: int) -> None:
+    user_briefs.delete(user_id)
+
+
+def invalidate_activity(activity_id: int) -> None:
+    activity_briefs.delete(activity_id)
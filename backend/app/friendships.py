@@ -0,0 +1,53 @@
+from datetime import datetime
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from app.models import Friendship
+
+
+def add_friendship(db: Session, user_id: int, friend_id: int) -> None:
+    """Adaugă prietenia în ambele direcții (idempotent)"""
+    now = datetime.utcnow()
+    stmt = insert(Friendship).values([
+        {"user_id": user_id, "friend_id": friend_id, "created_at": now},
+        {"user_id": friend_id, "friend_id": user_id, "created_at": now},
+    ]).on_conflict_do_nothing(index_elements=[Friendship.user_id, Friendship.friend_id])
+    db.execute(stmt)
+
+
+def remove_friendship(db: Session, user_id: int, friend_id: int) -> int:
+    """Șterge prietenia în ambele direcții; returnează numărul de rânduri șterse"""
+    return db.query(Friendship).filter(
+        or_(
+            and_(Friendship.user_id == user_id, Friendship.friend_id == friend_id),
+            and_(Friendship.user_id == friend_id, Friendship.friend_id == user_id)
+        )
+    ).delete(synchronize_session=False)
+
+
+def are_friends(db: Session, user_id: int, friend_id: int) -> bool:
+    """Verifică prietenia printr-un lookup pe cheia primară"""
+    return db.get(Friendship, (user_id, friend_id)) is not None
+
+
+def friend_ids_select(user_id: int):
+    """SELECT cu id-urile prietenilor unui utilizator (pentru subquery-uri)"""
+    return select(Friendship.friend_id).where(Friendship.user_id == user_id)
+
+
+def count_friends(db: Session, user_id: int, since: datetime = None) -> int:
+    """Numără prietenii unui utilizator, opțional doar pe cei adăugați după `since`"""
+    query = db.query(func.count()).select_from(Friendship).filter(Friendship.user_id == user_id)
+    if since is not None:
+        query = query.filter(Friendship.created_at >= since)
+    return query.scalar() or 0
+
+
+def mutual_friend_ids_select(user_id: int, other_id: int):
+    """SELECT cu prietenii comuni a doi utilizatori (intersecție de două range scan-uri)"""
+    other = Friendship.__table__.alias("other")
+    return (
+        select(Friendship.friend_id)
+        .join(other, and_(other.c.friend_id == Friendship.friend_id, other.c.user_id == other_id))
+        .where(Friendship.user_id == user_id)
+    )
@@ -0,0 +1,117 @@
+import math
+import re
+import struct
+from typing import Optional, Tuple
+from sqlalchemy import func
+
+# SRID-ul tuturor coloanelor de locație (WGS84)
+SRID = 4326
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Alfabetul geohash (base32 fără a, i, l, o)
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Flag-urile EWKB (PostGIS) din câmpul de tip
+_EWKB_Z = 0x80000000
+_EWKB_M = 0x40000000
+_EWKB_SRID = 0x20000000
+_WKB_POINT = 1
+
+_WKT_POINT = re.compile(r"^\s*(?:SRID=\d+;)?\s*POINT\s*\(\s*(\S+)\s+(\S+)[^)]*\)\s*$", re.IGNORECASE)
+
+
+def decode_point(data) -> Optional[Tuple[float, float]]:
+    """(longitudine, latitudine) dintr-un punct WKB/EWKB (bytes, memoryview sau hex); None pentru POINT EMPTY"""
+    if isinstance(data, str):
+        data = bytes.fromhex(data)
+    data = bytes(data)
+    byte_order = "<" if data[0] == 1 else ">"
+    (geometry_type,) = struct.unpack_from(byte_order + "I", data, 1)
+    offset = 5
+    if geometry_type & _EWKB_SRID:
+        offset += 4
+    if (geometry_type & 0xFFFF) % 1000 != _WKB_POINT:
+        raise ValueError("Geometria nu este un punct")
+    x, y = struct.unpack_from(byte_order + "dd", data, offset)
+    if math.isnan(x) or math.isnan(y):
+        return None
+    return x, y
+
+
+def point_lat_lng(element) -> Tuple[Optional[float], Optional[float]]:
+    """(latitudine, longitudine) pentru o valoare de coloană Geometry('POINT'); (None, None) dacă lipsește"""
+    if element is None:
+        return None, None
+    data = getattr(element, "data", element)
+    if isinstance(data, str) and not _is_hex(data):
+        # WKTElement (valoare atribuită în sesiune, încă nereîncărcată din baza de date)
+        match = _WKT_POINT.match(data)
+        if match is None:
+            return None, None
+        return float(match.group(2)), float(match.group(1))
+    coordinates = decode_point(data)
+    if coordinates is None:
+        return None, None
+    return coordinates[1], coordinates[0]
+
+
+def _is_hex(value: str) -> bool:
+    return len(value) % 2 == 0 and all(c in "0123456789abcdefABCDEF" for c in value[:18])
+
+
+def make_point(longitude: float, latitude: float):
+    """Expresie SQL pentru un punct WGS84, cu coordonatele ca parametri bind"""
+    return func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), SRID)
+
+
+def lat_lng_columns(column) -> tuple:
+    """Coloanele latitude/longitude citite direct în query (ST_Y/ST_X)"""
+    return func.ST_Y(column).label("latitude"), func.ST_X(column).label("longitude")
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distanța pe sferă dintre două puncte, în km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """Geohash-ul celulei care conține punctul, cu `precision` caractere"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        if coordinate >= middle:
+            value = (value << 1) | 1
+            interval[0] = middle
+        else:
+            value <<= 1
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) ale celulei geohash"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
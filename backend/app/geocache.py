@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import func, cast
+from sqlalchemy.orm import Session
+from geoalchemy2 import Geography
+from app.models import Activity, User, not_ended
+from app.metrics import record_cache
+from app.geo import make_point, haversine_km, geohash_encode, geohash_bounds
+
+# Razele sunt rotunjite în sus la unul dintre aceste buckete (km); peste ultimul nu se folosește cache-ul
+RADIUS_BUCKETS_KM = (1, 2, 5, 10, 25, 50, 100, 250)
+# Precizia geohash per bucket: celula rămâne mică față de rază, deci setul de candidați nu crește mult
+# (precizia 6 ~ 1.2 x 0.6 km, 5 ~ 4.9 km, 4 ~ 39 x 19.5 km, 3 ~ 156 km)
+GEOHASH_PRECISION = {1: 6, 2: 6, 5: 5, 10: 5, 25: 4, 50: 4, 100: 3, 250: 3}
+# Distanțele pe sferă și pe elipsoid diferă cu cel mult ~0.5%
+SPHEROID_MARGIN = 1.01
+# Cât timp este servit un set de candidați (secunde). Scrierile invalidează imediat celulele afectate, dar
+# doar în worker-ul care a făcut modificarea; ceilalți servesc setul vechi până expiră
+NEARBY_CACHE_TTL_SECONDS = float(os.getenv("NEARBY_CACHE_TTL_SECONDS", "120"))
+# Numărul maxim de celule păstrate per cache (LRU)
+NEARBY_CACHE_MAX_ENTRIES = int(os.getenv("NEARBY_CACHE_MAX_ENTRIES", "5000"))
+# Peste atâția candidați o celulă nu este păstrată (query-ul se face direct)
+NEARBY_CACHE_MAX_CANDIDATES = int(os.getenv("NEARBY_CACHE_MAX_CANDIDATES", "5000"))
+
+
+def radius_bucket(radius_km: float):
+    """Cel mai mic bucket care acoperă raza (None dacă raza depășește toate bucketele)"""
+    for bucket in RADIUS_BUCKETS_KM:
+        if radius_km <= bucket:
+            return bucket
+    return None
+
+
+def cell_of(latitude: float, longitude: float, bucket: float) -> tuple:
+    """(geohash, centrul celulei, raza de căutare pentru candidați în km)"""
+    geohash = geohash_encode(latitude, longitude, GEOHASH_PRECISION[bucket])
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    center = ((lat_min + lat_max) / 2, (lng_min + lng_max) / 2)
+    # Orice punct aflat la `bucket` km de un centru din celulă este la cel mult bucket + semidiagonala
+    # de centrul celulei; marja acoperă diferența sferă (haversine) - elipsoid (ST_DWithin)
+    half_diagonal = max(haversine_km(center[0], center[1], lat, lng)
+                        for lat in (lat_min, lat_max) for lng in (lng_min, lng_max))
+    return geohash, center, (bucket + half_diagonal) * SPHEROID_MARGIN
+
+
+class NearbyCandidateCache:
+    """Seturi de candidați (id, lat, lng, ...) per (celulă geohash, bucket de rază, filtre), LRU cu TTL"""
+
+    def __init__(self, name: str, ttl_seconds: float = NEARBY_CACHE_TTL_SECONDS,
+                 max_entries: int = NEARBY_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # cheie -> (expiră la, centrul celulei, raza candidaților, candidați)
+        self._entries = OrderedDict()
+        # Crește la fiecare invalidare: un set încărcat înaintea ei nu mai este scris în cache
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, center, search_km: float, load):
+        """Candidații celulei; la miss sunt încărcați cu load(center, search_km).
+        Întoarce None dacă celula are prea mulți candidați pentru a fi păstrată"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                record_cache(self.name, True)
+                return entry[3]
+            generation = self._generation
+
+        record_cache(self.name, False)
+        candidates = load(center, search_km)
+        if len(candidates) > NEARBY_CACHE_MAX_CANDIDATES:
+            return None
+        with self._lock:
+            # O locație scrisă în timpul încărcării nu a găsit celula de invalidat; setul este doar folosit
+            if generation != self._generation:
+                return candidates
+            self._entries[key] = (now + self.ttl_seconds, center, search_km, candidates)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return candidates
+
+    def invalidate_point(self, longitude, latitude) -> int:
+        """Elimină celulele al căror cerc de candidați conține punctul; întoarce câte au fost eliminate"""
+        if latitude is None or longitude is None:
+            return 0
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, (_, center, search_km, _) in self._entries.items()
+                if haversine_km(center[0], center[1], latitude, longitude) <= search_km
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+nearby_activities_cache = NearbyCandidateCache("nearby_activities")
+nearby_users_cache = NearbyCandidateCache("nearby_users")
+
+
+def within_radius(latitude: float, longitude: float, radius_km: float, points) -> list:
+    """[(item, distanță km)] pentru punctele (item, lat, lng) din rază, ordonate după distanța haversine;
+    aceeași distanță și ordine pentru răspunsurile din cache și pentru query-urile directe"""
+    matches = []
+    for item, lat, lng in points:
+        distance = haversine_km(latitude, longitude, lat, lng)
+        if distance <= radius_km:
+            matches.append((item, distance))
+    matches.sort(key=lambda match: match[1])
+    return matches
+
+
+def _load_activity_candidates(db: Session, category, include_past: bool):
+    def load(center, search_km):
+        latitude, longitude = center
+        query = db.query(
+            Activity.id, func.ST_Y(Activity.location), func.ST_X(Activity.location),
+            func.coalesce(Activity.end_time, Activity.start_time)
+        ).filter(
+            Activity.is_public == True,
+            func.ST_DWithin(
+                cast(Activity.location, Geography),
+                cast(make_point(longitude, latitude), Geography),
+                search_km * 1000
+            )
+        )
+        if category:
+            query = query.filter(Activity.category == category)
+        if not include_past:
+            query = query.filter(not_ended(datetime.utcnow()))
+        return [tuple(row) for row in query.limit(NEARBY_CACHE_MAX_CANDIDATES + 1).all()]
+
+    return load
+
+
+def nearby_activity_ids(db: Session, latitude: float, longitude: float, radius_km: float,
+                        category=None, include_past: bool = True):
+    """[(id, distanță km)] pentru activitățile publice din rază, ordonate după distanță;
+    None dacă raza sau celula nu pot fi servite din cache (apelantul face query-ul direct)"""
+    bucket = radius_bucket(radius_km)
+    if bucket is None:
+        return None
+    geohash, center, search_km = cell_of(latitude, longitude, bucket)
+    candidates = nearby_activities_cache.get(
+        (geohash, bucket, category or None, include_past), center, search_km,
+        _load_activity_candidates(db, category, include_past)
+    )
+    if candidates is None:
+        return None
+
+    # Distanța exactă față de centrul cererii și timpul (setul poate fi mai vechi decât acum)
+    now = datetime.utcnow()
+    return within_radius(latitude, longitude, radius_km, (
+        (activity_id, lat, lng) for activity_id, lat, lng, ends_at in candidates
+        if include_past or ends_at >= now
+    ))
+
+
+def _load_user_candidates(db: Session):
+    def load(center, search_km):
+        latitude, longitude = center
+        query = db.query(
+            User.id, func.ST_Y(User.home_location), func.ST_X(User.home_location)
+        ).filter(
+            User.home_location.isnot(None),
+            func.ST_DWithin(
+                cast(User.home_location, Geography),
+                cast(make_point(longitude, latitude), Geography),
+                search_km * 1000
+            )
+        )
+        return [tuple(row) for row in query.limit(NEARBY_CACHE_MAX_CANDIDATES + 1).all()]
+
+    return load
+
+
+def nearby_user_distances(db: Session, latitude: float, longitude: float, radius_km: float):
+    """{id: (lat, lng, distanță km)} pentru utilizatorii cu locație din rază; None dacă nu se poate din cache"""
+    bucket = radius_bucket(radius_km)
+    if bucket is None:
+        return None
+    geohash, center, search_km = cell_of(latitude, longitude, bucket)
+    candidates = nearby_users_cache.get((geohash, bucket), center, search_km, _load_user_candidates(db))
+    if candidates is None:
+        return None
+
+    return {
+        user_id: (lat, lng, distance)
+        for (user_id, lat, lng), distance in within_radius(
+            latitude, longitude, radius_km, ((row, row[1], row[2]) for row in candidates)
+        )
+    }
@@ -0,0 +1,331 @@
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, TYPE_CHECKING
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.geo import lat_lng_columns, SRID
+from app.metrics import record_cache
+from app.models import Activity, not_ended
+
+# numpy este importat la prima randare, nu la pornirea worker-ului
+if TYPE_CHECKING:
+    import numpy as np
+
+TILE_SIZE = 256
+# Zoom-ul maxim pentru care se generează tile-uri
+HEATMAP_MAX_ZOOM = int(os.getenv("HEATMAP_MAX_ZOOM", "18"))
+# Deviația standard a kernel-ului gaussian, în pixeli
+HEATMAP_SIGMA_PX = float(os.getenv("HEATMAP_SIGMA_PX", "12"))
+# Densitatea (activități sub kernel) la care culoarea ajunge la ~63% din maxim
+HEATMAP_SATURATION = float(os.getenv("HEATMAP_SATURATION", "8"))
+# Cât timp este servit un tile din cache (activitățile trec în trecut și ies din hartă). Invalidarea
+# după poziție ajunge doar la worker-ul care a făcut modificarea; ceilalți servesc tile-ul până expiră
+HEATMAP_TTL_SECONDS = int(os.getenv("HEATMAP_TTL_SECONDS", "120"))
+# Cât timp poate folosi browserul un tile fără revalidare (ETag); scurt, ca invalidările să fie vizibile
+HEATMAP_CLIENT_MAX_AGE_SECONDS = int(os.getenv("HEATMAP_CLIENT_MAX_AGE_SECONDS", "30"))
+# Memoria maximă pentru tile-urile din cache; cele scoase din memorie sunt scrise pe disc
+HEATMAP_CACHE_MAX_BYTES = int(os.getenv("HEATMAP_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+HEATMAP_SPILL_DIR = os.getenv("HEATMAP_SPILL_DIR", "cache/heatmap")
+HEATMAP_SPILL_MAX_FILES = int(os.getenv("HEATMAP_SPILL_MAX_FILES", "20000"))
+# Punctele pentru un tile sunt limitate (un tile la zoom mic acoperă toată țara)
+HEATMAP_MAX_POINTS = int(os.getenv("HEATMAP_MAX_POINTS", "200000"))
+
+# Kernel-ul este trunchiat la 3 sigma; tile-ul este calculat cu această margine în jur
+KERNEL_RADIUS_PX = int(math.ceil(3 * HEATMAP_SIGMA_PX))
+
+
+def tile_bounds(z: int, x: int, y: int, margin_px: int = 0) -> tuple:
+    """(lng_min, lat_min, lng_max, lat_max) pentru un tile XYZ (Web Mercator), cu margine în pixeli"""
+    n = 2 ** z
+    margin = margin_px / TILE_SIZE
+
+    def lng(tx):
+        return tx / n * 360.0 - 180.0
+
+    def lat(ty):
+        ty = min(max(ty, 0), n)
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return lng(x - margin), lat(y + 1 + margin), lng(x + 1 + margin), lat(y - margin)
+
+
+def tile_of(z: int, longitude: float, latitude: float) -> tuple:
+    """Tile-ul XYZ care conține punctul (coordonate fracționare)"""
+    n = 2 ** z
+    lat_rad = math.radians(max(min(latitude, 85.0511), -85.0511))
+    tx = (longitude + 180.0) / 360.0 * n
+    ty = (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * n
+    return tx, ty
+
+
+def _pixels(z: int, x: int, y: int, lngs: "np.ndarray", lats: "np.ndarray") -> tuple:
+    """Coordonatele în pixeli ale punctelor, relativ la colțul tile-ului"""
+    import numpy as np
+
+    scale = (2 ** z) * TILE_SIZE
+    lat_rad = np.radians(np.clip(lats, -85.0511, 85.0511))
+    px = (lngs + 180.0) / 360.0 * scale - x * TILE_SIZE
+    py = (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2 * scale - y * TILE_SIZE
+    return px, py
+
+
+@lru_cache(maxsize=None)
+def _gaussian_kernel() -> "np.ndarray":
+    import numpy as np
+
+    offsets = np.arange(-KERNEL_RADIUS_PX, KERNEL_RADIUS_PX + 1, dtype=np.float64)
+    return np.exp(-0.5 * (offsets / HEATMAP_SIGMA_PX) ** 2)
+
+
+def density(px: "np.ndarray", py: "np.ndarray") -> "np.ndarray":
+    """Densitatea kernel (gaussiană, separabilă) pe grila TILE_SIZE x TILE_SIZE"""
+    import numpy as np
+
+    kernel = _gaussian_kernel()
+    r = KERNEL_RADIUS_PX
+    size = TILE_SIZE + 2 * r
+    # Histograma punctelor pe grila extinsă cu marginea kernel-ului
+    ix = np.floor(px).astype(np.int64) + r
+    iy = np.floor(py).astype(np.int64) + r
+    inside = (ix >= 0) & (ix < size) & (iy >= 0) & (iy < size)
+    counts = np.bincount(iy[inside] * size + ix[inside], minlength=size * size)
+    grid = counts.reshape(size, size).astype(np.float64)
+
+    # Convoluție separabilă: câte o sumă de felii decalate pe fiecare axă
+    rows = np.zeros((size, TILE_SIZE))
+    for offset, weight in enumerate(kernel):
+        rows += weight * grid[:, offset:offset + TILE_SIZE]
+    result = np.zeros((TILE_SIZE, TILE_SIZE))
+    for offset, weight in enumerate(kernel):
+        result += weight * rows[offset:offset + TILE_SIZE, :]
+    return result
+
+
+@lru_cache(maxsize=None)
+def _colormap() -> "np.ndarray":
+    """Paletă RGBA cu 256 de intrări: transparent -> albastru -> cyan -> verde -> galben -> roșu"""
+    import numpy as np
+
+    stops = np.array([
+        (0.00, 0, 0, 255, 0),
+        (0.15, 0, 0, 255, 110),
+        (0.35, 0, 200, 255, 160),
+        (0.55, 0, 220, 0, 190),
+        (0.75, 255, 230, 0, 215),
+        (1.00, 230, 0, 0, 235),
+    ], dtype=np.float64)
+    positions = np.linspace(0.0, 1.0, 256)
+    channels = [np.interp(positions, stops[:, 0], stops[:, c]) for c in range(1, 5)]
+    return np.stack(channels, axis=1).round().astype(np.uint8)
+
+
+def encode_png(rgba: "np.ndarray") -> bytes:
+    """PNG RGBA 8 biți (fără filtre), din array-ul (înălțime, lățime, 4)"""
+    import numpy as np
+
+    height, width, _ = rgba.shape
+    # Fiecare rând începe cu octetul de filtru 0 (None)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+    return _png(width, height, raw.tobytes())
+
+
+def _png(width: int, height: int, raw: bytes) -> bytes:
+    """Fișierul PNG RGBA din rândurile deja prefixate cu octetul de filtru"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", header),
+        chunk(b"IDAT", zlib.compress(raw, 6)),
+        chunk(b"IEND", b""),
+    ))
+
+
+# Tile-ul complet transparent: toți octeții (filtre și pixeli) sunt 0, deci nu este nevoie de numpy
+EMPTY_TILE = _png(TILE_SIZE, TILE_SIZE, bytes(TILE_SIZE * (TILE_SIZE * 4 + 1)))
+
+
+def render_tile(db: Session, z: int, x: int, y: int) -> bytes:
+    """Tile-ul heatmap PNG pentru activitățile publice care nu s-au terminat (aceleași ca markerele)"""
+    lng_min, lat_min, lng_max, lat_max = tile_bounds(z, x, y, KERNEL_RADIUS_PX)
+    latitude, longitude = lat_lng_columns(Activity.location)
+    rows = db.query(longitude, latitude).filter(
+        Activity.is_public == True,
+        not_ended(datetime.utcnow()),
+        func.ST_Intersects(
+            Activity.location,
+            func.ST_MakeEnvelope(max(lng_min, -180), lat_min, min(lng_max, 180), lat_max, SRID)
+        )
+    ).limit(HEATMAP_MAX_POINTS).all()
+    if not rows:
+        return EMPTY_TILE
+
+    import numpy as np
+
+    points = np.asarray(rows, dtype=np.float64)
+    px, py = _pixels(z, x, y, points[:, 0], points[:, 1])
+    intensity = 1.0 - np.exp(-density(px, py) / HEATMAP_SATURATION)
+    rgba = _colormap()[np.minimum((intensity * 255).astype(np.int64), 255)]
+    return encode_png(rgba)
+
+
+class TileCache:
+    """LRU de tile-uri PNG limitat în octeți; tile-urile scoase din memorie sunt păstrate pe disc"""
+
+    def __init__(self, max_bytes: int = HEATMAP_CACHE_MAX_BYTES, spill_dir: Optional[str] = HEATMAP_SPILL_DIR,
+                 ttl_seconds: float = HEATMAP_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # Directorul este per proces: invalidarea dintr-un worker nu ajunge la discul altuia
+        self.spill_dir = os.path.join(spill_dir, str(os.getpid())) if spill_dir else None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._spilled = OrderedDict()
+        # Crește la fiecare invalidare: un tile randat înaintea ei nu mai este scris în cache
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.spill_dir, "{}_{}_{}.png".format(*key))
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    record_cache("heatmap_tiles", True)
+                    return entry[1]
+                self._drop(key)
+            # Citirea de pe disc și reintrarea în memorie sunt sub lock: o invalidare concurentă
+            # nu poate găsi tile-ul între cele două și apoi să-l vadă readus
+            expires = self._spilled.pop(key, None)
+            data = None
+            if expires is not None:
+                if expires > now:
+                    try:
+                        with open(self._path(key), "rb") as f:
+                            data = f.read()
+                    except OSError:
+                        data = None
+                # Tile-ul revine în memorie; fișierul este rescris doar dacă iese din nou
+                self._remove_file(key)
+            if data is not None:
+                spill = self._insert(key, data, expires)
+        if data is not None:
+            self._spill_all(spill)
+            record_cache("heatmap_tiles", True)
+            return data
+        record_cache("heatmap_tiles", False)
+        return None
+
+    def generation(self) -> int:
+        """Versiunea de luat înainte de randare și de dat la put()"""
+        with self._lock:
+            return self._generation
+
+    def put(self, key: tuple, data: bytes, expires: Optional[float] = None, generation: Optional[int] = None) -> None:
+        """Scrie un tile; cu `generation`, tile-ul este ignorat dacă între timp a avut loc o invalidare"""
+        expires = expires if expires is not None else time.time() + self.ttl_seconds
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            spill = self._insert(key, data, expires)
+        self._spill_all(spill)
+
+    def _insert(self, key: tuple, data: bytes, expires: float) -> list:
+        """Adaugă în LRU (sub lock); întoarce intrările scoase din memorie, de scris pe disc"""
+        spill = []
+        self._drop(key)
+        self._entries[key] = (expires, data)
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, (old_expires, old_data) = self._entries.popitem(last=False)
+            self._bytes -= len(old_data)
+            spill.append((old_key, old_expires, old_data, self._generation))
+        return spill
+
+    def _spill_all(self, spill: list) -> None:
+        for old_key, old_expires, old_data, generation in spill:
+            self._spill(old_key, old_expires, old_data, generation)
+
+    def _spill(self, key: tuple, expires: float, data: bytes, generation: int) -> None:
+        if not self.spill_dir or data is EMPTY_TILE:
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._path(key), "wb") as f:
+                f.write(data)
+        except OSError:
+            return
+        with self._lock:
+            # Între scoaterea din memorie și scrierea pe disc tile-ul nu este în niciun dict; o invalidare
+            # din acest interval nu l-a găsit, deci fișierul nu mai este înregistrat
+            if generation != self._generation:
+                self._remove_file(key)
+                return
+            self._spilled[key] = expires
+            while len(self._spilled) > HEATMAP_SPILL_MAX_FILES:
+                old_key, _ = self._spilled.popitem(last=False)
+                self._remove_file(old_key)
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _remove_file(self, key: tuple) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def invalidate(self, key: tuple) -> None:
+        with self._lock:
+            self._generation += 1
+            self._drop(key)
+            spilled = self._spilled.pop(key, None) is not None
+        if spilled:
+            self._remove_file(key)
+
+    def invalidate_point(self, longitude: Optional[float], latitude: Optional[float]) -> None:
+        """Invalidează, la fiecare zoom, tile-urile în care kernel-ul punctului este vizibil"""
+        if longitude is None or latitude is None:
+            return
+        margin = KERNEL_RADIUS_PX / TILE_SIZE
+        for z in range(HEATMAP_MAX_ZOOM + 1):
+            n = 2 ** z
+            tx, ty = tile_of(z, longitude, latitude)
+            for x in range(max(int(math.floor(tx - margin)), 0), min(int(math.floor(tx + margin)), n - 1) + 1):
+                for y in range(max(int(math.floor(ty - margin)), 0), min(int(math.floor(ty + margin)), n - 1) + 1):
+                    self.invalidate((z, x, y))
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._spilled)
+            self._entries.clear()
+            self._spilled.clear()
+            self._bytes = 0
+            self._generation += 1
+        for key in keys:
+            self._remove_file(key)
+
+
+def tile_etag(data: bytes) -> str:
+    """ETag-ul unui tile, după conținut (la fel în toate worker-ele)"""
+    return '"{}"'.format(hashlib.blake2b(data, digest_size=8).hexdigest())
+
+
+heatmap_tiles = TileCache()
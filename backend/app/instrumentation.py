@@ -0,0 +1,163 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.sql")
+
+# Modul dev/test: ridică RepeatedQueryError când aceeași formă de query se repetă de mai mult de N ori
+# într-o cerere (0 = dezactivat)
+SQL_REPEAT_LIMIT = int(os.getenv("SQL_REPEAT_LIMIT", "0"))
+# Peste acest număr de repetări cererea este logată ca suspectă de N+1
+SQL_REPEAT_WARN = int(os.getenv("SQL_REPEAT_WARN", "10"))
+
+
+class RepeatedQueryError(RuntimeError):
+    """Aceeași formă de query a rulat de prea multe ori într-o singură cerere (N+1)"""
+
+    def __init__(self, shape: str, count: int):
+        super().__init__(f"Query repetat de {count} ori într-o cerere: {shape}")
+        self.shape = shape
+        self.count = count
+
+
+class RequestSqlStats:
+    """Statisticile SQL ale unei cereri"""
+
+    __slots__ = ("route", "count", "total_time", "shapes")
+
+    def __init__(self, route: Optional[str] = None):
+        self.route = route
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+    def most_repeated(self) -> tuple:
+        """(formă, număr) pentru query-ul cel mai repetat, sau (None, 0)"""
+        if not self.shapes:
+            return None, 0
+        return self.shapes.most_common(1)[0]
+
+
+_current_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar("request_sql_stats", default=None)
+
+_BIND_PARAM = re.compile(r"%\(\w+\)s|%s|(?<!:):(?!:)\w+|\$\d+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """Forma normalizată a unui query: parametrii și literalii devin '?', listele IN se comprimă"""
+    shape = _BIND_PARAM.sub("?", statement)
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _VALUE_LIST.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def current_sql_stats() -> Optional[RequestSqlStats]:
+    """Statisticile SQL ale cererii curente (None în afara unei cereri)"""
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    shape = statement_shape(statement)
+    stats.shapes[shape] += 1
+    if SQL_REPEAT_LIMIT and stats.shapes[shape] > SQL_REPEAT_LIMIT:
+        raise RepeatedQueryError(shape, stats.shapes[shape])
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.total_time += time.perf_counter() - starts.pop()
+    stats.count += 1
+
+
+def _handle_error(exception_context):
+    # Query eșuat: scoate timpul de start rămas pe conexiune
+    conn = exception_context.connection
+    if conn is not None and _current_stats.get() is not None:
+        starts = conn.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+def install_sql_instrumentation(engine: Engine) -> None:
+    """Atașează hook-urile de numărare/cronometrare la engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class SqlInstrumentationMiddleware:
+    """Middleware ASGI: atribuie query-urile cererii curente, adaugă Server-Timing și loghează sumarul"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSqlStats(f"{scope['method']} {scope['path']}")
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                server_timing = (
+                    f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries", '
+                    f"app;dur={total_ms:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            self._log(scope, status_code, stats, time.perf_counter() - started)
+
+    @staticmethod
+    def _log(scope, status_code: int, stats: RequestSqlStats, duration: float) -> None:
+        shape, repeats = stats.most_repeated()
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 1),
+            "db_statements": stats.count,
+            "db_time_ms": round(stats.total_time * 1000, 1),
+            "db_max_repeat": repeats,
+        }
+        if SQL_REPEAT_WARN and repeats > SQL_REPEAT_WARN:
+            logger.warning("Posibil N+1: %s %s repetă de %d ori: %s",
+                           scope["method"], scope["path"], repeats, shape,
+                           extra={**fields, "db_repeated_shape": shape})
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s %s: %d queries, %.1f ms DB", scope["method"], scope["path"],
+                         stats.count, stats.total_time * 1000, extra=fields)
@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from starlette.concurrency import run_in_threadpool
+from app.database import engine, SessionLocal, DB_POOL_SIZE
+from app.routers.activities import warm_map_cache
+from app.routers.statistics import warm_statistics_cache
+
+logger = logging.getLogger(__name__)
+
+# Câte conexiuni sunt deschise la pornire (implicit tot pool-ul de bază)
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+# Timeout pentru query-urile de readiness (ms)
+READINESS_TIMEOUT_MS = int(os.getenv("READINESS_TIMEOUT_MS", "2000"))
+# Umple la pornire cache-urile comune tuturor clienților (0 = primele cereri le calculează)
+CACHE_WARM = os.getenv("CACHE_WARM", "1") != "0"
+
+
+def warm_pool(size: int = DB_POOL_WARM) -> int:
+    """Deschide `size` conexiuni și le returnează în pool; întoarce câte au reușit"""
+    connections = []
+    try:
+        for _ in range(min(size, DB_POOL_SIZE)):
+            connections.append(engine.connect())
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+
+def warm_caches() -> list:
+    """Calculează intrările de cache identice pentru toți clienții; întoarce numele celor încălzite"""
+    warmed = []
+    db = SessionLocal()
+    try:
+        for name, warm in (("statistics.general", warm_statistics_cache), ("activities.by_county", warm_map_cache)):
+            warm(db)
+            warmed.append(name)
+    finally:
+        db.close()
+    return warmed
+
+
+def check_database() -> dict:
+    """Verifică baza de date și extensia PostGIS (ridică excepție dacă nu sunt disponibile)"""
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {READINESS_TIMEOUT_MS}")
+            postgis = conn.execute(text("SELECT PostGIS_Lib_Version()")).scalar()
+    return {"postgis": postgis}
+
+
+def _startup(app) -> None:
+    started = time.perf_counter()
+    # Configurarea mapper-elor ORM se face altfel la primul query al primei cereri
+    configure_mappers()
+    try:
+        warmed = warm_pool()
+    except Exception:
+        # Pornirea nu eșuează: /api/health/ready raportează baza indisponibilă până își revine
+        logger.warning("Pool-ul de conexiuni nu a putut fi încălzit", exc_info=True)
+        warmed = 0
+    caches = []
+    if CACHE_WARM and warmed:
+        try:
+            caches = warm_caches()
+        except Exception:
+            logger.warning("Cache-urile nu au putut fi încălzite", exc_info=True)
+    app.state.started = True
+    logger.info("Pornire completă în %.1f ms (%d conexiuni încălzite, cache-uri: %s)",
+                (time.perf_counter() - started) * 1000, warmed, ", ".join(caches) or "-")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Pornirea explicită a worker-ului: mapper-e ORM, pool de conexiuni și cache-uri încălzite"""
+    app.state.started = False
+    await run_in_threadpool(_startup, app)
+    yield
+    engine.dispose()
@@ -0,0 +1,89 @@
+"""Joburi de mentenanță pentru baza de date.
+
+Se rulează periodic (cron / scheduler), din directorul backend:
+
+    python -m app.maintenance purge-read-notifications
+    python -m app.maintenance refresh-friend-suggestions
+    python -m app.maintenance refresh-stale-friend-suggestions
+    python -m app.maintenance maintain-message-partitions
+"""
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import exists, and_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import (
+    ReadNotification, Participation, ParticipationStatus, FriendRequest, FriendRequestStatus
+)
+from app.suggestions import refresh_all_suggestions, refresh_stale_suggestions
+from app.partitions import maintain_message_partitions
+
+# Cererile de prietenie acceptate apar în notificări doar 24 de ore
+FRIEND_REQUEST_ACCEPTED_WINDOW = timedelta(hours=24)
+
+
+def purge_read_notifications(db: Session) -> dict:
+    """Șterge rândurile din read_notifications care nu mai pot corespunde unei notificări afișate"""
+    deleted = {}
+
+    # Mesajele folosesc message_read_marks; rândurile per mesaj sunt redundante
+    deleted["new_message"] = db.query(ReadNotification).filter(
+        ReadNotification.notification_type == "new_message"
+    ).delete(synchronize_session=False)
+
+    # Cereri de participare care nu mai sunt pending (sau au fost șterse)
+    deleted["participation_request"] = db.query(ReadNotification).filter(
+        ReadNotification.notification_type == "participation_request",
+        ~exists().where(and_(
+            Participation.id == ReadNotification.notification_id,
+            Participation.status == ParticipationStatus.PENDING
+        ))
+    ).delete(synchronize_session=False)
+
+    # Cereri de prietenie primite care nu mai sunt pending
+    deleted["friend_request_received"] = db.query(ReadNotification).filter(
+        ReadNotification.notification_type == "friend_request_received",
+        ~exists().where(and_(
+            FriendRequest.id == ReadNotification.notification_id,
+            FriendRequest.status == FriendRequestStatus.PENDING
+        ))
+    ).delete(synchronize_session=False)
+
+    # Cereri de prietenie acceptate ieșite din fereastra de 24h
+    cutoff = datetime.utcnow() - FRIEND_REQUEST_ACCEPTED_WINDOW
+    deleted["friend_request_accepted"] = db.query(ReadNotification).filter(
+        ReadNotification.notification_type == "friend_request_accepted",
+        ~exists().where(and_(
+            FriendRequest.id == ReadNotification.notification_id,
+            FriendRequest.status == FriendRequestStatus.ACCEPTED,
+            FriendRequest.created_at >= cutoff
+        ))
+    ).delete(synchronize_session=False)
+
+    db.commit()
+    return deleted
+
+
+JOBS = {
+    "purge-read-notifications": purge_read_notifications,
+    "refresh-friend-suggestions": refresh_all_suggestions,
+    "refresh-stale-friend-suggestions": refresh_stale_suggestions,
+    "maintain-message-partitions": maintain_message_partitions,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Joburi de mentenanță SocialExplore")
+    parser.add_argument("job", choices=sorted(JOBS))
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = JOBS[args.job](db)
+    finally:
+        db.close()
+    print(f"[{args.job}] {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import json
+import struct
+
+# Formatul binar columnar (little-endian), versiunea 1:
+#   "SEMK" | uint8 versiune | 3 octeți rezervați | uint32 count | uint32 lungimea tabelei de categorii
+#   tabela de categorii (JSON UTF-8, listă de string-uri), completată cu spații până la multiplu de 4
+#   int32[count] id | float32[count] lat | float32[count] lng | uint32[count] start_time (Unix, secunde)
+#   uint16[count] index în tabela de categorii
+# Toate coloanele încep la offset multiplu de 4 (uint16 este ultima), deci se pot citi direct
+# ca TypedArray/numpy fără copiere.
+BINARY_MEDIA_TYPE = "application/vnd.socialexplore.markers"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+JSON_MEDIA_TYPE = "application/json"
+
+MAGIC = b"SEMK"
+VERSION = 1
+_HEADER = struct.Struct("<4sB3xII")
+
+# Coloanele în ordinea din payload, cu tipul numpy
+COLUMNS = (
+    ("id", "<i4"),
+    ("lat", "<f4"),
+    ("lng", "<f4"),
+    ("start_time", "<u4"),
+    ("category", "<u2"),
+)
+
+
+def build_columns(rows: list) -> tuple:
+    """(coloane numpy, categorii) din rândurile (id, lat, lng, category, start_time)"""
+    # Importat la prima cerere de markere, nu la pornirea worker-ului
+    import numpy as np
+
+    if not rows:
+        empty = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+        return empty, []
+    ids, lats, lngs, categories, start_times = zip(*rows)
+    table, codes = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+    columns = {
+        "id": np.asarray(ids, dtype="<i4"),
+        "lat": np.asarray(lats, dtype="<f4"),
+        "lng": np.asarray(lngs, dtype="<f4"),
+        "start_time": np.asarray(start_times, dtype="<u4"),
+        "category": codes.astype("<u2"),
+    }
+    return columns, [str(c) for c in table]
+
+
+def encode_binary(columns: dict, categories: list) -> bytes:
+    table = json.dumps(categories, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    table += b" " * (-len(table) % 4)
+    count = len(columns["id"])
+    parts = [_HEADER.pack(MAGIC, VERSION, count, len(table)), table]
+    parts.extend(columns[name].tobytes() for name, _ in COLUMNS)
+    return b"".join(parts)
+
+
+def encode_msgpack(columns: dict, categories: list) -> bytes:
+    import msgpack
+
+    # Coloanele sunt blob-uri binare (little-endian), tipul fiecăreia este în "dtypes"
+    return msgpack.packb({
+        "version": VERSION,
+        "count": len(columns["id"]),
+        "categories": categories,
+        "dtypes": {name: dtype.lstrip("<") for name, dtype in COLUMNS},
+        **{name: columns[name].tobytes() for name, _ in COLUMNS},
+    }, use_bin_type=True)
+
+
+def encode_json(columns: dict, categories: list) -> bytes:
+    # Varianta de depanare: aceleași coloane, ca liste JSON
+    payload = {
+        "version": VERSION,
+        "count": len(columns["id"]),
+        "categories": categories,
+        **{name: columns[name].tolist() for name, _ in COLUMNS},
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate(accept: str) -> str:
+    """Tipul de conținut ales după header-ul Accept (implicit formatul binar)"""
+    for item in (accept or "").split(","):
+        media_type = item.split(";", 1)[0].strip().lower()
+        if media_type == BINARY_MEDIA_TYPE or media_type in ("*/*", "application/*", "application/octet-stream"):
+            return BINARY_MEDIA_TYPE
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return MSGPACK_MEDIA_TYPES[0]
+        if media_type == JSON_MEDIA_TYPE:
+            return JSON_MEDIA_TYPE
+    return BINARY_MEDIA_TYPE
+
+
+ENCODERS = {
+    BINARY_MEDIA_TYPE: encode_binary,
+    MSGPACK_MEDIA_TYPES[0]: encode_msgpack,
+    JSON_MEDIA_TYPE: encode_json,
+}
+
+
+def encode_markers(rows: list, media_type: str) -> bytes:
+    columns, categories = build_columns(rows)
+    return ENCODERS[media_type](columns, categories)
@@ -0,0 +1,121 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+# Bucket-uri în secunde, de la query-uri de 1ms la cereri de câteva secunde
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Durata cererilor HTTP",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Cereri HTTP în curs")
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Durata instrucțiunilor SQL", ["operation"], buckets=LATENCY_BUCKETS
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "auth_password_hash_seconds", "Durata operațiilor bcrypt", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Accesări de cache", ["cache", "result"])
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total", "Cereri identice simultane (leader = calcul executat, follower = rezultat împărțit)",
+    ["name", "role"]
+)
+LOAD_SHED = Counter("load_shed_total", "Cereri respinse de limitatoare", ["limit", "reason"])
+
+# Operațiile SQL etichetate; restul intră la "other" (cardinalitate fixă)
+SQL_OPERATIONS = ("select", "insert", "update", "delete", "with")
+
+
+def record_cache(cache: str, hit: bool, count: int = 1) -> None:
+    """Numără hit-uri/miss-uri pentru cache-ul dat"""
+    if count:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+class DatabasePoolCollector:
+    """Starea pool-ului de conexiuni, citită la fiecare scrape"""
+
+    def __init__(self, engine: Engine):
+        self.pool = engine.pool
+
+    def collect(self):
+        metrics = GaugeMetricFamily("db_pool_connections", "Conexiunile din pool-ul SQLAlchemy", labels=["state"])
+        for state, reader in (("size", "size"), ("checked_out", "checkedout"),
+                              ("checked_in", "checkedin"), ("overflow", "overflow")):
+            read = getattr(self.pool, reader, None)
+            if read is not None:
+                metrics.add_metric([state], read())
+        yield metrics
+
+
+def install_db_metrics(engine: Engine) -> None:
+    """Cronometrează instrucțiunile SQL și expune starea pool-ului"""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+        DB_STATEMENT_DURATION.labels(operation if operation in SQL_OPERATIONS else "other").observe(
+            time.perf_counter() - started
+        )
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    REGISTRY.register(DatabasePoolCollector(engine))
+
+
+def route_template(app, scope) -> str:
+    """Șablonul rutei (ex. /api/activities/{activity_id}), ca eticheta să nu depindă de id-uri"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    for candidate in app.router.routes:
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: durata și numărul cererilor per rută, plus cererile în curs"""
+
+    def __init__(self, app, fastapi_app=None):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], route_template(self.fastapi_app, scope), str(status_code)
+            ).observe(time.perf_counter() - started)
+
+
+def metrics_payload() -> tuple:
+    """(conținut, content-type) în formatul text Prometheus"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
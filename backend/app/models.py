@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, Text, Enum as SQLEnum, text, func
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import JSON, TSVECTOR
 from geoalchemy2 import Geometry
 from datetime import datetime
 import enum
@@ -52,14 +52,30 @@ class Activity(Base):
     end_time = Column(DateTime, nullable=True)
     location = Column(Geometry('POINT', srid=4326), nullable=False)  # PostGIS Point
     max_people = Column(Integer, nullable=True)
+    accepted_count = Column(Integer, nullable=False, default=0, server_default="0")  # Participanți acceptați (actualizat atomic)
     is_public = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Full-text (română + engleză, fără diacritice), menținut de trigger în baza de date
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
 
     # Relații
     creator = relationship("User", back_populates="created_activities", foreign_keys=[creator_id])
     participations = relationship("Participation", back_populates="activity", cascade="all, delete-orphan")
     messages = relationship("Message", back_populates="activity", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_activities_search_vector", "search_vector", postgresql_using="gin"),
+        # Index-uri parțiale: interogările hărții și listelor privesc doar activitățile publice
+        Index("ix_activities_public_start_time", "start_time", postgresql_where=text("is_public")),
+        Index("ix_activities_public_location", "location", postgresql_using="gist",
+              postgresql_where=text("is_public")),
+    )
+
+
+def not_ended(now: datetime):
+    """Activitățile care nu s-au terminat (cele fără end_time: care nu au început încă)"""
+    return func.coalesce(Activity.end_time, Activity.start_time) >= now
+
 
 class Participation(Base):
     __tablename__ = "participations"
@@ -89,19 +105,67 @@ class FriendRequest(Base):
     to_user = relationship("User", foreign_keys=[to_user_id], back_populates="received_friend_requests")
 
 
+class Friendship(Base):
+    __tablename__ = "friendships"
+
+    # Prietenie materializată în ambele direcții: (A, B) și (B, A)
+    # Lista de prieteni a unui utilizator este un range scan pe cheia primară
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    friend_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FriendSuggestion(Base):
+    __tablename__ = "friend_suggestions"
+
+    # Sugestii precalculate ("persoane pe care le-ai putea cunoaște"), servite ordonate după scor
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    candidate_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    mutual_friends = Column(Integer, nullable=False, default=0)
+    shared_interests = Column(Integer, nullable=False, default=0)
+    distance_km = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_friend_suggestions_user_score", "user_id", "score"),
+        Index("ix_friend_suggestions_candidate_id", "candidate_id"),
+    )
+
+
+class FriendSuggestionState(Base):
+    __tablename__ = "friend_suggestion_states"
+
+    # Când au fost calculate sugestiile unui utilizator (și pentru cei fără niciun candidat) și dacă
+    # trebuie recalculate de jobul de mentenanță
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    computed_at = Column(DateTime, nullable=True)
+    stale = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ix_friend_suggestion_states_stale", "user_id", postgresql_where=text("stale")),
+    )
+
+
 class Message(Base):
     __tablename__ = "messages"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Tabelă partiționată lunar după created_at (cheia primară din baza de date este (id, created_at));
+    # partițiile sunt create și arhivate de app.partitions
+    id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey("activities.id"), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     text = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
     # Relații
     activity = relationship("Activity", back_populates="messages")
     sender = relationship("User", back_populates="sent_messages")
 
+    __table_args__ = (
+        Index("ix_messages_activity_created", "activity_id", "created_at"),
+    )
+
 
 class ReadNotification(Base):
     __tablename__ = "read_notifications"
@@ -122,3 +186,14 @@ class ReadNotification(Base):
         {'extend_existing': True},
     )
 
+
+class MessageReadMark(Base):
+    __tablename__ = "message_read_marks"
+
+    # Un singur rând per (cititor, activitate, expeditor): ultimul mesaj citit (high-water mark).
+    # Un mesaj este necitit dacă id-ul lui este mai mare decât last_read_message_id.
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    activity_id = Column(Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True)
+    sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_read_message_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
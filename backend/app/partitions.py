@@ -0,0 +1,91 @@
+import os
+import re
+from datetime import date, datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Câte luni în avans au partiție proprie (mesajele nu trebuie să ajungă în messages_default)
+MESSAGE_PARTITIONS_AHEAD = int(os.getenv("MESSAGE_PARTITIONS_AHEAD", "3"))
+# Partițiile mai vechi de atâtea luni sunt detașate ca tabele messages_archive_YYYYMM (0 = niciodată)
+MESSAGE_ARCHIVE_AFTER_MONTHS = int(os.getenv("MESSAGE_ARCHIVE_AFTER_MONTHS", "12"))
+
+_PARTITION_NAME = re.compile(r"^messages_p(\d{4})(\d{2})$")
+
+
+def add_months(day: date, months: int) -> date:
+    """Prima zi a lunii aflate la `months` luni de `day`"""
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def message_partitions(db: Session) -> dict:
+    """Partițiile lunare atașate la messages: {prima zi a lunii: nume}"""
+    names = db.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'messages'::regclass
+    """)).scalars().all()
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def default_partition_months(db: Session) -> list:
+    """Lunile care au rânduri în messages_default (ex. mesaje mai vechi decât migrarea sau importate)"""
+    months = db.execute(text("""
+        SELECT DISTINCT date_trunc('month', created_at)::date FROM messages_default ORDER BY 1
+    """)).scalars().all()
+    return list(months)
+
+
+def create_message_partition(db: Session, month: date) -> str:
+    """Creează partiția lunii; rândurile din messages_default care îi aparțin sunt mutate în ea"""
+    name = f"messages_p{month:%Y%m}"
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    # O partiție nouă nu poate fi creată cât timp partiția default conține rânduri din intervalul ei
+    db.execute(text("""
+        CREATE TEMPORARY TABLE messages_moved ON COMMIT DROP AS
+        WITH moved AS (
+            DELETE FROM messages_default WHERE created_at >= :lower AND created_at < :upper RETURNING *
+        )
+        SELECT * FROM moved
+    """), {"lower": lower, "upper": upper})
+    db.execute(text(f"CREATE TABLE {name} PARTITION OF messages FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    db.execute(text("INSERT INTO messages SELECT * FROM messages_moved"))
+    db.execute(text("DROP TABLE messages_moved"))
+    return name
+
+
+def maintain_message_partitions(db: Session) -> dict:
+    """Creează partițiile lunilor următoare, mută lunile rămase în messages_default în partiții proprii
+    și arhivează (detașează) partițiile vechi"""
+    this_month = datetime.utcnow().date().replace(day=1)
+    existing = message_partitions(db)
+
+    months = [add_months(this_month, offset) for offset in range(MESSAGE_PARTITIONS_AHEAD + 1)]
+    months += default_partition_months(db)
+    created = []
+    for month in sorted(set(months)):
+        if month not in existing:
+            existing[month] = create_message_partition(db, month)
+            created.append(existing[month])
+            db.commit()
+
+    archived = []
+    if MESSAGE_ARCHIVE_AFTER_MONTHS:
+        cutoff = add_months(this_month, -MESSAGE_ARCHIVE_AFTER_MONTHS)
+        for month, name in sorted(existing.items()):
+            if month >= cutoff:
+                break
+            # Tabela detașată rămâne interogabilă (sau poate fi exportată / ștearsă manual)
+            archive = f"messages_archive_{month:%Y%m}"
+            db.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+            db.execute(text(f"ALTER TABLE {name} RENAME TO {archive}"))
+            db.commit()
+            archived.append(archive)
+
+    return {"created": created, "archived": archived}
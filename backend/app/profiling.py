@@ -0,0 +1,289 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.auth import decode_access_token
+from app.dependencies import ADMIN_EMAILS
+
+# Fracțiunea de cereri profilate automat (0 = doar la cerere, prin header)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Directorul cu profilurile (.folded pentru flamegraph, .json cu metadatele și alocările)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+# Intervalul de eșantionare a stivei (ms)
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Câte profiluri sunt păstrate; cele mai vechi sunt șterse
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+# Adâncimea stivei reținute de tracemalloc pentru fiecare alocare
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+
+# Header-ul care cere profilarea unei cereri (acceptat doar cu token de administrator)
+PROFILE_HEADER = b"x-profile"
+# Câte linii de alocări sunt păstrate în metadate
+TOP_ALLOCATIONS = 30
+
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}_[0-9a-f]{6}$")
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+# Id-ul profilului cererii curente; ajunge și în threadpool (contextul este copiat la run_in_threadpool)
+_profile_id = contextvars.ContextVar("profile_id", default=None)
+
+
+def _context_matches(context, profile_id: str) -> bool:
+    return isinstance(context, contextvars.Context) and context.get(_profile_id) == profile_id
+
+
+def _worker_context(frame):
+    """Contextul lucrului executat acum de un thread din threadpool (None dacă thread-ul este liber)"""
+    # Bucla worker-ului anyio (WorkerThread.run) ține în variabile locale contextul copiat al apelantului
+    # și future-ul lucrului curent; după terminare le păstrează până la următorul lucru
+    while frame is not None:
+        if frame.f_code.co_name == "run":
+            variables = frame.f_locals
+            context, future = variables.get("context"), variables.get("future")
+            if isinstance(context, contextvars.Context) and future is not None:
+                return None if future.done() else context
+        frame = frame.f_back
+    return None
+
+
+class StackSampler(threading.Thread):
+    """Eșantionează periodic stivele care lucrează pentru o cerere (wall-clock, include timpul petrecut în I/O):
+    thread-ul event loop cât timp rulează task-ul cererii și thread-urile din threadpool care execută
+    lucrul ei sincron (query-uri, calcule din cache și single-flight)"""
+
+    def __init__(self, profile_id: str, loop, task, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.profile_id = profile_id
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self.task = task
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def _owns_task(self, task) -> bool:
+        if task is None:
+            return False
+        get_context = getattr(task, "get_context", None)
+        if get_context is not None:
+            return _context_matches(get_context(), self.profile_id)
+        # Python < 3.11: middleware-urile sunt ASGI pure, cererea rulează în task-ul în care a început
+        return task is self.task
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                if thread_id == self.loop_thread_id:
+                    # Event loop-ul rulează pe rând task-urile tuturor cererilor
+                    if not self._owns_task(asyncio.current_task(self.loop)):
+                        continue
+                elif not _context_matches(_worker_context(frame), self.profile_id):
+                    continue
+                self.stacks[_folded_stack(frame)] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _folded_stack(frame) -> str:
+    """Stiva în formatul "folded" (rădăcina prima, cadre separate prin ';')"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+def _short_path(filename: str) -> str:
+    # Căile din site-packages și din biblioteca standard sunt scurtate la pachet/modul
+    marker = "site-packages" + os.sep
+    index = filename.find(marker)
+    if index >= 0:
+        return filename[index + len(marker):]
+    if filename.startswith(_STDLIB):
+        return filename[len(_STDLIB):].lstrip(os.sep)
+    return os.path.relpath(filename) if os.path.isabs(filename) else filename
+
+
+def _is_admin_request(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                email = decode_access_token(token)
+                return email is not None and email.lower() in ADMIN_EMAILS
+    return False
+
+
+class RequestProfiler:
+    """Profilează cereri individuale: stivă wall-clock (flamegraph) + snapshot tracemalloc"""
+
+    def __init__(self, directory: str = PROFILE_DIR, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        # O singură cerere profilată odată: tracemalloc este global (alocările altor cereri concurente
+        # apar și ele în snapshot)
+        self._busy = threading.Lock()
+
+    def wants_profile(self, scope) -> bool:
+        if any(name == PROFILE_HEADER for name, _ in scope.get("headers", [])):
+            return _is_admin_request(scope)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> Optional[dict]:
+        if not self._busy.acquire(blocking=False):
+            return None
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        created_at = datetime.utcnow()
+        profile_id = f"{created_at:%Y%m%dT%H%M%S}_{random.getrandbits(24):06x}"
+        sampler = StackSampler(
+            profile_id, asyncio.get_running_loop(), asyncio.current_task(), PROFILE_INTERVAL_MS / 1000.0
+        )
+        sampler.start()
+        return {
+            "id": profile_id,
+            "sampler": sampler,
+            "started_tracing": started_tracing,
+            "started": time.perf_counter(),
+            "created_at": created_at,
+        }
+
+    def finish(self, session: dict, scope, status_code: int) -> None:
+        """Oprește eșantionarea și scrie profilul (rulat în threadpool: snapshot-ul și fișierele blochează)"""
+        try:
+            duration = time.perf_counter() - session["started"]
+            session["sampler"].stop()
+            snapshot = tracemalloc.take_snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+            if session["started_tracing"]:
+                tracemalloc.stop()
+
+            profile_id = session["id"]
+            snapshot = snapshot.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ))
+            allocations = [
+                {
+                    "location": f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+                for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            ]
+            metadata = {
+                "id": profile_id,
+                "created_at": session["created_at"].isoformat(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "status": status_code,
+                "duration_ms": round(duration * 1000, 1),
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "samples": sum(session["sampler"].stacks.values()),
+                "traced_memory_kb": round(traced / 1024, 1),
+                "peak_memory_kb": round(peak / 1024, 1),
+                "top_allocations": allocations,
+            }
+            self._write(profile_id, session["sampler"].stacks, metadata)
+        finally:
+            self._busy.release()
+
+    def _write(self, profile_id: str, stacks: Counter, metadata: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        self._prune()
+
+    def _prune(self) -> None:
+        for profile_id in self.profile_ids()[PROFILE_MAX_FILES:]:
+            for suffix in (".folded", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def profile_ids(self) -> list:
+        """Id-urile profilurilor salvate, cele mai noi primele"""
+        if not os.path.isdir(self.directory):
+            return []
+        ids = {name.rsplit(".", 1)[0] for name in os.listdir(self.directory) if name.endswith(".json")}
+        return sorted((i for i in ids if PROFILE_ID.match(i)), reverse=True)
+
+    def list_profiles(self, limit: int = 50) -> list:
+        profiles = []
+        for profile_id in self.profile_ids()[:limit]:
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json"), encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            metadata.pop("top_allocations", None)
+            profiles.append(metadata)
+        return profiles
+
+    def profile_path(self, profile_id: str, kind: str) -> Optional[str]:
+        """Calea fișierului profilului (None dacă id-ul este invalid sau fișierul lipsește)"""
+        if not PROFILE_ID.match(profile_id) or kind not in ("folded", "json"):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{kind}")
+        return path if os.path.isfile(path) else None
+
+
+request_profiler = RequestProfiler()
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI: profilează cererile marcate cu X-Profile (admin) sau eșantionate aleator"""
+
+    def __init__(self, app, profiler: RequestProfiler = request_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.start()
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        token = _profile_id.set(session["id"])
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", session["id"].encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _profile_id.reset(token)
+            await run_in_threadpool(self.profiler.finish, session, scope, status_code)
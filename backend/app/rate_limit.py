@@ -0,0 +1,237 @@
+import ipaddress
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from fastapi import HTTPException, Request, status
+from app.auth import decode_access_token
+from app.metrics import LOAD_SHED
+
+logger = logging.getLogger(__name__)
+
+# Dezactivează complet limitarea (ex. pentru benchmark-uri)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# memory = per worker; redis = bucket-uri partajate între workeri/instanțe
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Numărul maxim de bucket-uri ținute în memorie (cele inactive sunt eliminate primele)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+# Proxy-urile (IP-uri sau rețele CIDR) de la care se acceptă X-Forwarded-For pentru IP-ul clientului
+RATE_LIMIT_TRUSTED_PROXIES = [
+    ipaddress.ip_network(item.strip(), strict=False)
+    for item in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if item.strip()
+]
+
+# Bugetele per rută: (capacitate, jetoane reîncărcate pe secundă). Chat-ul interoghează la 5s
+# (0.2/s) și notificările la 10s (0.1/s); bugetele permit câteva tab-uri deschise
+RATE_LIMITS = {
+    "messages.poll": (30, 0.6),
+    "messages.send": (20, 0.5),
+    "notifications.poll": (20, 0.3),
+    "search": (30, 1.0),
+    "map": (60, 2.0),
+    # O deplasare a hărții cere zeci de tile-uri; se consumă doar la randare, hit-urile din cache sunt libere
+    "map.tiles": (300, 10.0),
+    "statistics": (10, 0.2),
+}
+# Suprascrieri din mediu: "messages.poll=60/1.2,search=10/0.5"
+for _item in filter(None, (i.strip() for i in os.getenv("RATE_LIMIT_OVERRIDES", "").split(","))):
+    _name, _, _budget = _item.partition("=")
+    _capacity, _, _refill = _budget.partition("/")
+    RATE_LIMITS[_name.strip()] = (float(_capacity), float(_refill))
+
+# Cereri simultane permise per worker pentru endpoint-urile scumpe (restul primesc 503)
+CONCURRENCY_LIMITS = {
+    "statistics.general": 2,
+    "activities.grid": 4,
+    "activities.heatmap": 4,
+    "activities.by_county": 2,
+}
+# Suprascrieri din mediu: "statistics.general=1,activities.grid=8"
+for _item in filter(None, (i.strip() for i in os.getenv("CONCURRENCY_LIMIT_OVERRIDES", "").split(","))):
+    _name, _, _limit = _item.partition("=")
+    CONCURRENCY_LIMITS[_name.strip()] = int(_limit)
+
+
+class MemoryBucketBackend:
+    """Token bucket în memoria procesului; fiecare worker are bugetul lui"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill: float) -> float:
+        """Consumă un jeton; întoarce 0 dacă a reușit, altfel secundele până la următorul jeton"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                wait, tokens = 0.0, tokens - 1
+            else:
+                wait = (1 - tokens) / refill if refill > 0 else 60.0
+            # Reinserat la final: dict-ul rămâne ordonat după ultima folosire
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.pop(next(iter(self._buckets)))
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketBackend:
+    """Token bucket partajat în Redis (script Lua atomic); la erori de conexiune cererea este permisă"""
+
+    SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local refill = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(state[1]) or capacity
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        elseif refill > 0 then
+            wait = (1 - tokens) / refill
+        else
+            wait = 60
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        local ttl = 60
+        if refill > 0 then ttl = math.ceil(capacity / refill) + 1 end
+        redis.call('EXPIRE', KEYS[1], ttl)
+        return tostring(wait)
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, prefix: str = "ratelimit:"):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key: str, capacity: float, refill: float) -> float:
+        try:
+            return float(self._script(keys=[self.prefix + key], args=[capacity, refill, time.time()]))
+        except Exception:
+            logger.warning("Backend-ul Redis pentru rate limiting nu răspunde", exc_info=True)
+            return 0.0
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+BACKENDS = {
+    "memory": MemoryBucketBackend,
+    "redis": RedisBucketBackend,
+}
+
+bucket_backend = BACKENDS[RATE_LIMIT_BACKEND]()
+
+
+def _trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def client_address(request: Request) -> str:
+    """IP-ul clientului; în spatele unui proxy de încredere, primul IP din X-Forwarded-For (de la dreapta) care nu e proxy"""
+    address = request.client.host if request.client else "unknown"
+    if not _trusted_proxy(address):
+        return address
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        address = hop
+        if not _trusted_proxy(hop):
+            break
+    return address
+
+
+def client_key(request: Request) -> str:
+    """Cheia bucket-ului: utilizatorul din JWT (fără query în baza de date), altfel IP-ul clientului"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        subject = decode_access_token(token)
+        if subject:
+            return f"user:{subject.lower()}"
+    return f"ip:{client_address(request)}"
+
+
+def enforce_rate_limit(name: str, request: Request) -> None:
+    """Consumă un jeton din bugetul `name` al clientului sau ridică 429"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    capacity, refill = RATE_LIMITS[name]
+    wait = bucket_backend.take(f"{name}:{client_key(request)}", capacity, refill)
+    if wait > 0:
+        LOAD_SHED.labels(name, "rate_limit").inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Prea multe cereri, încercați din nou mai târziu",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+
+
+def rate_limit(name: str):
+    """Dependință de rută: consumă un jeton din bugetul `name` al clientului sau răspunde 429"""
+    if name not in RATE_LIMITS:
+        raise KeyError(f"Buget de rate limiting necunoscut: {name}")
+
+    async def check_rate_limit(request: Request) -> None:
+        enforce_rate_limit(name, request)
+
+    return check_rate_limit
+
+
+class ConcurrencyLimiter:
+    """Numărul de cereri simultane pentru un endpoint scump; peste limită cererea este respinsă imediat"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    @contextmanager
+    def slot(self):
+        """Ține un loc pe durata blocului sau ridică 503 dacă limita este atinsă"""
+        if not RATE_LIMIT_ENABLED:
+            yield
+            return
+        if not self.acquire():
+            LOAD_SHED.labels(self.name, "concurrency").inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Serviciul este ocupat, încercați din nou",
+                headers={"Retry-After": "1"}
+            )
+        try:
+            yield
+        finally:
+            self.release()
+
+
+concurrency_limiters = {name: ConcurrencyLimiter(name, limit) for name, limit in CONCURRENCY_LIMITS.items()}
@@ -0,0 +1,131 @@
+import math
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import func, cast
+from sqlalchemy.orm import Session
+from geoalchemy2 import Geography
+from app.models import Activity, Participation, ParticipationStatus, User
+from app.friendships import friend_ids_select
+from app.cache import Cache
+from app.geo import make_point, haversine_km
+
+# Regiunile sunt celule de grid de REGION_CELL_DEG grade; toți utilizatorii dintr-o celulă
+# împart același set de candidați
+REGION_CELL_DEG = 0.5
+# Raza în jurul centrului regiunii din care se iau candidații (km)
+REGION_RADIUS_KM = 60
+# Numărul maxim de candidați păstrați per regiune
+MAX_CANDIDATES = 2000
+# Cât timp este servit un set de candidați înainte de a fi recalculat (secunde)
+CANDIDATES_TTL_SECONDS = 300
+
+# Ponderile componentelor scorului
+WEIGHT_DISTANCE = 3.0
+WEIGHT_INTERESTS = 2.0
+WEIGHT_FRIENDS = 2.5
+WEIGHT_FILLING = 1.0
+
+def region_key(latitude, longitude):
+    """Celula de grid a unei locații (None pentru utilizatorii fără locație)"""
+    if latitude is None or longitude is None:
+        return None
+    return (math.floor(latitude / REGION_CELL_DEG), math.floor(longitude / REGION_CELL_DEG))
+
+
+# Candidații sunt tupluri simple (serializabile pentru backend-ul Redis)
+RegionCandidate = namedtuple(
+    "RegionCandidate", "id lat lng category created_at accepted_count max_people creator_id"
+)
+
+
+def load_region_candidates(db: Session, key) -> list:
+    """Încarcă activitățile publice viitoare dintr-o regiune (o singură proiecție)"""
+    lon = func.ST_X(Activity.location)
+    lat = func.ST_Y(Activity.location)
+    query = db.query(
+        Activity.id, lat.label("lat"), lon.label("lng"), Activity.category,
+        Activity.created_at, Activity.accepted_count, Activity.max_people, Activity.creator_id
+    ).filter(
+        Activity.is_public == True,
+        Activity.start_time >= datetime.utcnow()
+    )
+
+    if key is not None:
+        center_lat = (key[0] + 0.5) * REGION_CELL_DEG
+        center_lng = (key[1] + 0.5) * REGION_CELL_DEG
+        query = query.filter(
+            func.ST_DWithin(
+                cast(Activity.location, Geography),
+                cast(make_point(center_lng, center_lat), Geography),
+                REGION_RADIUS_KM * 1000
+            )
+        )
+
+    return [RegionCandidate(*row) for row in query.order_by(Activity.start_time).limit(MAX_CANDIDATES).all()]
+
+
+# Seturi de activități candidate per regiune, recalculate după CANDIDATES_TTL_SECONDS
+candidate_cache = Cache("recommendation_candidates", CANDIDATES_TTL_SECONDS)
+
+
+def _matches_interests(category: str, interests: set) -> bool:
+    category = (category or "").lower()
+    return any(i.startswith(category) or category.startswith(i) for i in interests if i)
+
+
+def recommend_activities(db: Session, user: User, latitude, longitude, limit: int) -> list:
+    """Returnează [(activity_id, scor)] pentru feed-ul personalizat, ordonat descrescător"""
+    key = region_key(latitude, longitude)
+    candidates = candidate_cache.get_or_set(key, lambda: load_region_candidates(db, key))
+    if not candidates:
+        return []
+
+    interests = {str(i).strip().lower() for i in (user.interests or [])}
+
+    # Prieteni acceptați la activități viitoare (o singură agregare)
+    friends_attending = dict(
+        db.query(Participation.activity_id, func.count(Participation.id)).join(
+            Activity, Activity.id == Participation.activity_id
+        ).filter(
+            Participation.user_id.in_(friend_ids_select(user.id)),
+            Participation.status == ParticipationStatus.ACCEPTED,
+            Activity.start_time >= datetime.utcnow()
+        ).group_by(Participation.activity_id).all()
+    )
+
+    # Activitățile la care utilizatorul a cerut deja să participe nu mai sunt recomandate
+    already_joined = {
+        activity_id for (activity_id,) in db.query(Participation.activity_id).join(
+            Activity, Activity.id == Participation.activity_id
+        ).filter(
+            Participation.user_id == user.id,
+            Activity.start_time >= datetime.utcnow()
+        ).all()
+    }
+
+    now = datetime.utcnow()
+    scored = []
+    for c in candidates:
+        if c.creator_id == user.id or c.id in already_joined:
+            continue
+        if c.max_people and c.accepted_count >= c.max_people:
+            continue
+
+        score = 0.0
+        if latitude is not None and longitude is not None:
+            distance_km = haversine_km(latitude, longitude, c.lat, c.lng)
+            score += WEIGHT_DISTANCE * max(0.0, 1.0 - distance_km / REGION_RADIUS_KM)
+
+        if _matches_interests(c.category, interests):
+            score += WEIGHT_INTERESTS
+
+        score += WEIGHT_FRIENDS * math.log1p(friends_attending.get(c.id, 0))
+
+        # Viteza de umplere: participanți acceptați pe oră de la creare
+        age_hours = max(1.0, (now - c.created_at).total_seconds() / 3600) if c.created_at else 1.0
+        score += WEIGHT_FILLING * (1.0 - math.exp(-(c.accepted_count or 0) / age_hours))
+
+        scored.append((c.id, score))
+
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
@@ -1,25 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from geoalchemy2 import WKTElement
-from geoalchemy2.shape import to_shape
-from geoalchemy2 import functions as geo_func
-from shapely.geometry import Point
+from sqlalchemy import func, and_, or_, cast, literal_column, text, BigInteger
+from geoalchemy2 import Geography
 from datetime import datetime
 from typing import Optional
 import math
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
-from app.models import Activity, User, Participation, ParticipationStatus
+from app.models import Activity, User, Participation, not_ended
 from app.schemas import (
     ActivityCreate, ActivityResponse, ActivityUpdate, ActivityFilter
 )
 from app.dependencies import get_current_user
+from app.recommendations import recommend_activities
+from app.geo import make_point, point_lat_lng, lat_lng_columns, SRID
+from app.markers import encode_markers, negotiate
+from app.heatmap import heatmap_tiles, render_tile, tile_etag, HEATMAP_MAX_ZOOM, HEATMAP_CLIENT_MAX_AGE_SECONDS
+from app.rate_limit import rate_limit, enforce_rate_limit, concurrency_limiters
+from app.coalesce import single_flight, coalesce_key
+from app.cache import Cache, invalidate_tags
+from app.geocache import nearby_activities_cache, nearby_activity_ids, within_radius, SPHEROID_MARGIN
+from app.entity_cache import get_users, invalidate_activity
 
 router = APIRouter()
 
+# Configurațiile full-text folosite de activities.search_vector
+SEARCH_CONFIGS = ("romanian", "english")
+# Numărul maxim de markere returnate pentru un viewport
+MAX_MARKERS = 50000
 
-def activity_to_dict(activity, current_user_id=None, db=None):
-    """Convertește un obiect Activity în dict cu lat/lng"""
+# Agregările pentru hartă (grid, județe), invalidate de orice scriere pe activități
+map_cache = Cache("activity_map", ttl_seconds=60)
+BY_COUNTY_TTL_SECONDS = 300
+
+
+def activity_to_dict(activity, current_user_id=None, db=None, creators=None, participations=None):
+    """Convertește un obiect Activity în dict cu lat/lng.
+    `creators` / `participations` sunt preîncărcate de activities_to_dicts pentru liste"""
     result = {
         "id": activity.id,
         "creator_id": activity.creator_id,
@@ -33,42 +50,48 @@ def activity_to_dict(activity, current_user_id=None, db=None):
         "created_at": activity.created_at
     }
 
-    # Convertim geometria în lat/lng
-    if activity.location:
-        point = to_shape(activity.location)
-        result["latitude"] = point.y
-        result["longitude"] = point.x
-    else:
-        result["latitude"] = None
-        result["longitude"] = None
-
-    # Adaugă numele creatorului
-    if db:
-        creator = db.query(User).filter(User.id == activity.creator_id).first()
+    # Convertim geometria în lat/lng (decodare directă a punctului WKB)
+    result["latitude"], result["longitude"] = point_lat_lng(activity.location)
+
+    # Adaugă numele creatorului (din cache-ul de entități)
+    if creators is None and db:
+        creators = get_users(db, (activity.creator_id,))
+    if creators is not None:
+        creator = creators.get(activity.creator_id)
         result["creator_name"] = creator.name if creator else None
 
-    # Numără participanții acceptați
-    if db:
-        participants_count = db.query(func.count(Participation.id)).filter(
-            Participation.activity_id == activity.id,
-            Participation.status == ParticipationStatus.ACCEPTED
-        ).scalar() or 0
-        result["participants_count"] = participants_count
+    # Participanții acceptați sunt ținuți direct pe activitate
+    result["participants_count"] = activity.accepted_count or 0
 
     # Verifică participarea utilizatorului curent
-    if current_user_id and db:
-        participation = db.query(Participation).filter(
-            Participation.activity_id == activity.id,
-            Participation.user_id == current_user_id
-        ).first()
-        if participation:
-            result["current_user_participation"] = participation.status.value
-        else:
-            result["current_user_participation"] = None
+    if current_user_id and participations is None and db:
+        participations = user_participation_statuses(db, current_user_id, (activity.id,))
+    if current_user_id and participations is not None:
+        result["current_user_participation"] = participations.get(activity.id)
 
     return result
 
 
+def user_participation_statuses(db: Session, user_id: int, activity_ids) -> dict:
+    """{activity_id: status} pentru participările utilizatorului la activitățile date, într-un singur query"""
+    activity_ids = list(activity_ids)
+    if not activity_ids:
+        return {}
+    rows = db.query(Participation.activity_id, Participation.status).filter(
+        Participation.user_id == user_id,
+        Participation.activity_id.in_(activity_ids)
+    ).all()
+    return {activity_id: participation_status.value for activity_id, participation_status in rows}
+
+
+def activities_to_dicts(activities, current_user_id, db) -> list:
+    """activity_to_dict pentru o listă: creatorii și participările sunt încărcate o singură dată"""
+    activities = list(activities)
+    creators = get_users(db, {activity.creator_id for activity in activities})
+    participations = user_participation_statuses(db, current_user_id, [activity.id for activity in activities])
+    return [activity_to_dict(activity, current_user_id, db, creators, participations) for activity in activities]
+
+
 @router.post("/", response_model=ActivityResponse, status_code=status.HTTP_201_CREATED)
 async def create_activity(
     activity_data: ActivityCreate,
@@ -84,9 +107,8 @@ async def create_activity(
                 detail="Data finală nu poate fi înainte de data inițială"
             )
     
-    # Creează geometrie Point din coordonate
-    point = Point(activity_data.longitude, activity_data.latitude)
-    location = WKTElement(point.wkt, srid=4326)
+    # Punctul este construit în baza de date (ST_MakePoint cu parametri bind)
+    location = make_point(activity_data.longitude, activity_data.latitude)
 
     new_activity = Activity(
         creator_id=current_user.id,
@@ -103,6 +125,9 @@ async def create_activity(
     db.add(new_activity)
     db.commit()
     db.refresh(new_activity)
+    heatmap_tiles.invalidate_point(activity_data.longitude, activity_data.latitude)
+    nearby_activities_cache.invalidate_point(activity_data.longitude, activity_data.latitude)
+    invalidate_tags("activities")
 
     return activity_to_dict(new_activity, current_user.id, db)
 
@@ -117,7 +142,8 @@ async def get_activities(
     max_distance_km: Optional[float] = Query(None, ge=0),
     latitude: Optional[float] = None,
     longitude: Optional[float] = None,
-    start_time_after: Optional[datetime] = None
+    start_time_after: Optional[datetime] = None,
+    include_past: bool = Query(True, description="false = doar activitățile care nu s-au terminat")
 ):
     """Obține lista de activități cu filtrare opțională"""
     query = db.query(Activity).filter(Activity.is_public == True)
@@ -126,40 +152,37 @@ async def get_activities(
     if category:
         query = query.filter(Activity.category == category)
 
-    # Filtrare după timp
+    # Filtrare după timp (include_past=false: doar activitățile care nu s-au terminat)
     if start_time_after:
         query = query.filter(Activity.start_time >= start_time_after)
+    elif not include_past:
+        query = query.filter(not_ended(datetime.utcnow()))
 
     # Filtrare spațială (distanță)
     if max_distance_km and latitude and longitude:
-        # Creează un punct de referință
-        reference_point = WKTElement(f"POINT({longitude} {latitude})", srid=4326)
         # Folosește ST_DWithin cu geografie pentru calcul corect al distanței pe sferă
         # Convertim km în metri
         distance_meters = max_distance_km * 1000
-        from sqlalchemy import text
         query = query.filter(
-            text("ST_DWithin("
-                 "ST_GeogFromWKB(ST_AsBinary(activities.location)), "
-                 "ST_GeogFromText(:ref_point), "
-                 ":distance_meters)"
-            ).bindparams(
-                ref_point=f"POINT({longitude} {latitude})",
-                distance_meters=distance_meters
+            func.ST_DWithin(
+                cast(Activity.location, Geography),
+                cast(make_point(longitude, latitude), Geography),
+                distance_meters
             )
         )
 
     activities = query.offset(skip).limit(limit).all()
 
-    return [activity_to_dict(activity, current_user.id, db) for activity in activities]
+    return activities_to_dicts(activities, current_user.id, db)
 
 
-@router.get("/nearby", response_model=list[ActivityResponse])
+@router.get("/nearby", response_model=list[ActivityResponse], dependencies=[Depends(rate_limit("search"))])
 async def get_nearby_activities(
     latitude: float = Query(..., description="Latitudine"),
     longitude: float = Query(..., description="Longitudine"),
     radius_km: float = Query(10, ge=0, le=10000, description="Rază în km"),
     category: Optional[str] = None,
+    include_past: bool = Query(True, description="false = doar activitățile care nu s-au terminat"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -168,23 +191,25 @@ async def get_nearby_activities(
     if radius_km is None or (isinstance(radius_km, float) and (radius_km != radius_km or radius_km <= 0)):  # radius_km != radius_km verifica NaN
         radius_km = 10
     
-    # Creează un punct de referință
-    reference_point = WKTElement(f"POINT({longitude} {latitude})", srid=4326)
-    # Convertim km în metri pentru ST_DWithin
-    distance_meters = radius_km * 1000
-
-    # Folosim ST_DWithin cu geografie pentru calcul corect al distanței pe sferă
-    # Transformăm geometria în geografie folosind funcția ST_GeogFromText sau cast
-    from sqlalchemy import text
-    query = db.query(Activity).filter(
+    # Setul de candidați este împărțit între cererile din aceeași celulă geohash și bucket de rază;
+    # distanța exactă și câmpurile per utilizator sunt aplicate după
+    matches = nearby_activity_ids(db, latitude, longitude, radius_km, category, include_past)
+    if matches is not None:
+        ids = [activity_id for activity_id, _ in matches]
+        by_id = {a.id: a for a in db.query(Activity).filter(Activity.id.in_(ids), Activity.is_public == True).all()}
+        activities = [by_id[activity_id] for activity_id, _ in matches if activity_id in by_id]
+        return activities_to_dicts(activities, current_user.id, db)
+
+    # Query direct (rază mare sau celulă densă): ST_DWithin pe elipsoid cu o mică margine, apoi aceeași
+    # distanță haversine și ordonare ca pentru răspunsurile din cache
+    distance_meters = radius_km * SPHEROID_MARGIN * 1000
+
+    query = db.query(Activity, *lat_lng_columns(Activity.location)).filter(
         Activity.is_public == True,
-        text("ST_DWithin("
-             "ST_GeogFromWKB(ST_AsBinary(activities.location)), "
-             "ST_GeogFromText(:ref_point), "
-             ":distance_meters)"
-        ).bindparams(
-            ref_point=f"POINT({longitude} {latitude})",
-            distance_meters=distance_meters
+        func.ST_DWithin(
+            cast(Activity.location, Geography),
+            cast(make_point(longitude, latitude), Geography),
+            distance_meters
         )
     )
 
@@ -192,9 +217,87 @@ async def get_nearby_activities(
     if category:
         query = query.filter(Activity.category == category)
 
-    activities = query.all()
+    if not include_past:
+        query = query.filter(not_ended(datetime.utcnow()))
+
+    activities = [activity for activity, _ in within_radius(latitude, longitude, radius_km, query.all())]
+
+    return activities_to_dicts(activities, current_user.id, db)
+
+
+@router.get("/search", response_model=list[ActivityResponse], dependencies=[Depends(rate_limit("search"))])
+async def search_activities(
+    q: str = Query(..., min_length=1, max_length=200, description="Text căutat în titlu și descriere"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+    max_distance_km: Optional[float] = Query(None, ge=0),
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    start_time_after: Optional[datetime] = None,
+    include_past: bool = Query(True, description="false = doar activitățile care nu s-au terminat")
+):
+    """Caută activități după text (full-text, română + engleză), combinat cu filtrele spațiale și de timp"""
+    # Interogarea este normalizată la fel ca documentul (fără diacritice), pe ambele limbi
+    ts_query = None
+    for config in SEARCH_CONFIGS:
+        config_query = func.websearch_to_tsquery(
+            literal_column(f"'{config}'::regconfig"), func.se_unaccent(q)
+        )
+        ts_query = config_query if ts_query is None else ts_query.op("||")(config_query)
+
+    rank = func.ts_rank_cd(Activity.search_vector, ts_query)
+    query = db.query(Activity).filter(
+        Activity.is_public == True,
+        Activity.search_vector.op("@@")(ts_query)
+    )
 
-    return [activity_to_dict(activity, current_user.id, db) for activity in activities]
+    if category:
+        query = query.filter(Activity.category == category)
+
+    if start_time_after:
+        query = query.filter(Activity.start_time >= start_time_after)
+    elif not include_past:
+        query = query.filter(not_ended(datetime.utcnow()))
+
+    if max_distance_km and latitude is not None and longitude is not None:
+        reference_point = make_point(longitude, latitude)
+        query = query.filter(
+            func.ST_DWithin(
+                cast(Activity.location, Geography),
+                cast(reference_point, Geography),
+                max_distance_km * 1000
+            )
+        )
+
+    activities = query.order_by(rank.desc(), Activity.start_time).offset(skip).limit(limit).all()
+
+    return activities_to_dicts(activities, current_user.id, db)
+
+
+@router.get("/recommended", response_model=list[ActivityResponse])
+async def get_recommended_activities(
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Feed personalizat: activități viitoare ordonate după distanță, interese, prieteni și ritmul de înscriere"""
+    latitude, longitude = point_lat_lng(current_user.home_location)
+
+    # Cache-ul de candidați poate aștepta lock-ul altui worker: calculul rulează în threadpool
+    ranked = await run_in_threadpool(recommend_activities, db, current_user, latitude, longitude, limit)
+    if not ranked:
+        return []
+
+    activities = {
+        activity.id: activity
+        for activity in db.query(Activity).filter(Activity.id.in_([aid for aid, _ in ranked])).all()
+    }
+    return activities_to_dicts(
+        [activities[aid] for aid, _ in ranked if aid in activities], current_user.id, db
+    )
 
 
 @router.get("/my/created", response_model=list[ActivityResponse])
@@ -207,11 +310,90 @@ async def get_my_created_activities(
         Activity.creator_id == current_user.id
     ).order_by(Activity.created_at.desc()).all()
 
-    return [activity_to_dict(activity, current_user.id, db) for activity in activities]
+    return activities_to_dicts(activities, current_user.id, db)
 
 
-@router.get("/grid")
-def activities_grid(
+@router.get("/markers", response_class=Response, dependencies=[Depends(rate_limit("map"))])
+async def get_activity_markers(
+    request: Request,
+    xmin: float = Query(..., ge=-180, le=180, description="Longitudine minimă a viewport-ului"),
+    ymin: float = Query(..., ge=-90, le=90, description="Latitudine minimă a viewport-ului"),
+    xmax: float = Query(..., ge=-180, le=180, description="Longitudine maximă a viewport-ului"),
+    ymax: float = Query(..., ge=-90, le=90, description="Latitudine maximă a viewport-ului"),
+    category: Optional[str] = None,
+    include_past: bool = False,
+    limit: int = Query(MAX_MARKERS, ge=1, le=MAX_MARKERS),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Markerele hărții (id, lat, lng, categorie, start) ca payload columnar: binar, MessagePack sau JSON după Accept"""
+    latitude, longitude = lat_lng_columns(Activity.location)
+    query = db.query(
+        Activity.id, latitude, longitude, Activity.category,
+        cast(func.extract("epoch", Activity.start_time), BigInteger)
+    ).filter(
+        Activity.is_public == True,
+        func.ST_Intersects(Activity.location, func.ST_MakeEnvelope(xmin, ymin, xmax, ymax, SRID))
+    )
+    if category:
+        query = query.filter(Activity.category == category)
+    if not include_past:
+        query = query.filter(not_ended(datetime.utcnow()))
+
+    # Un rând în plus semnalează că viewport-ul are mai multe markere decât limita
+    rows = query.order_by(Activity.start_time).limit(limit + 1).all()
+    truncated = len(rows) > limit
+    media_type = negotiate(request.headers.get("accept"))
+
+    return Response(
+        content=encode_markers(rows[:limit], media_type),
+        media_type=media_type,
+        headers={"Vary": "Accept", "X-Markers-Truncated": "1" if truncated else "0"}
+    )
+
+
+@router.get("/heatmap/{z}/{x}/{y}.png", response_class=Response)
+async def get_heatmap_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """Tile heatmap (PNG 256x256, XYZ Web Mercator) cu densitatea activităților publice care nu s-au terminat"""
+    if not 0 <= z <= HEATMAP_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tile inexistent"
+        )
+
+    key = (z, x, y)
+    tile = heatmap_tiles.get(key)
+    if tile is None:
+        # Doar randarea consumă din buget: o deplasare a hărții cere zeci de tile-uri, majoritatea din cache
+        enforce_rate_limit("map.tiles", request)
+        # Clienții care deschid aceeași zonă cer aceleași tile-uri: o randare per tile
+        # Limita de concurență ține doar randarea: hit-urile și cererile care așteaptă nu ocupă un loc
+        def render():
+            # O activitate modificată în timpul randării invalidează tile-ul; rezultatul nu intră în cache
+            generation = heatmap_tiles.generation()
+            with concurrency_limiters["activities.heatmap"].slot():
+                rendered = render_tile(db, z, x, y)
+            heatmap_tiles.put(key, rendered, generation=generation)
+            return rendered
+
+        # Cererile care așteaptă randarea nu țin câte un thread din threadpool
+        tile = await single_flight.do_async("activities.heatmap", key, render)
+
+    # max-age scurt: după expirare browserul revalidează cu ETag și primește 304 dacă tile-ul nu s-a schimbat
+    headers = {"Cache-Control": f"public, max-age={HEATMAP_CLIENT_MAX_AGE_SECONDS}", "ETag": tile_etag(tile)}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=tile, media_type="image/png", headers=headers)
+
+
+@router.get("/grid", dependencies=[Depends(rate_limit("map"))])
+async def activities_grid(
     xmin: float,
     ymin: float,
     xmax: float,
@@ -219,6 +401,17 @@ def activities_grid(
     cell_km: float = 10,
     db: Session = Depends(get_db),
 ):
+    # Același viewport (cerut simultan sau repetat) este calculat o singură dată
+    def compute():
+        with concurrency_limiters["activities.grid"].slot():
+            return compute_activities_grid(db, xmin, ymin, xmax, ymax, cell_km)
+
+    key = ("grid", *coalesce_key(xmin, ymin, xmax, ymax, cell_km))
+    return await map_cache.get_or_set_async(key, compute, tags=("activities",))
+
+
+def compute_activities_grid(db: Session, xmin: float, ymin: float, xmax: float, ymax: float, cell_km: float) -> dict:
+    """Numărul de activități pe celule de `cell_km` din viewport, ca FeatureCollection GeoJSON"""
     # build lon/lat expressions from geometry
     lon = func.ST_X(Activity.location)
     lat = func.ST_Y(Activity.location)
@@ -265,6 +458,52 @@ def activities_grid(
     return {"type": "FeatureCollection", "features": features}
 
 
+# Înainte de /{activity_id}, altfel "by-county" ar fi interpretat ca id
+@router.get("/by-county")
+async def activities_by_county(db: Session = Depends(get_db)):
+    # Agregarea este aceeași pentru toți clienții: servită din cache, cu un singur calcul la expirare
+    def compute():
+        with concurrency_limiters["activities.by_county"].slot():
+            return compute_activities_by_county(db)
+
+    return await map_cache.get_or_set_async(
+        "by_county", compute, tags=("activities",), ttl_seconds=BY_COUNTY_TTL_SECONDS
+    )
+
+
+def warm_map_cache(db: Session) -> None:
+    """Umple cache-ul agregării pe județe (la pornirea worker-ului)"""
+    map_cache.get_or_set(
+        "by_county", lambda: compute_activities_by_county(db), tags=("activities",), ttl_seconds=BY_COUNTY_TTL_SECONDS
+    )
+
+
+def compute_activities_by_county(db: Session) -> list:
+    """Numărul de activități din fiecare județ (poligoanele din romania_counties)"""
+    sql = text("""
+    SELECT
+        c.nuts_id,
+        c.name_latn,
+        COUNT(a.id) AS activity_count
+    FROM romania_counties c
+    LEFT JOIN activities a
+        ON a.location IS NOT NULL
+        AND ST_Contains(c.geom, a.location)
+    WHERE c.cntr_code = 'RO'
+    GROUP BY c.nuts_id, c.name_latn
+    """)
+    rows = db.execute(sql).fetchall()
+
+    return [
+        {
+            "nuts_id": r.nuts_id,
+            "name": r.name_latn,
+            "activity_count": r.activity_count
+        }
+        for r in rows
+    ]
+
+
 
 @router.get("/{activity_id}", response_model=ActivityResponse)
 async def get_activity(
@@ -332,13 +571,22 @@ async def update_activity(
     if activity_update.is_public is not None:
         activity.is_public = activity_update.is_public
 
+    # Locația veche: tile-urile heatmap și celulele nearby din jurul ei sunt invalidate după salvare
+    old_latitude, old_longitude = point_lat_lng(activity.location)
+
     # Actualizează locația dacă este furnizată
     if activity_update.latitude is not None and activity_update.longitude is not None:
-        point = Point(activity_update.longitude, activity_update.latitude)
-        activity.location = WKTElement(point.wkt, srid=4326)
+        activity.location = make_point(activity_update.longitude, activity_update.latitude)
 
     db.commit()
     db.refresh(activity)
+    heatmap_tiles.invalidate_point(old_longitude, old_latitude)
+    nearby_activities_cache.invalidate_point(old_longitude, old_latitude)
+    if activity_update.latitude is not None and activity_update.longitude is not None:
+        heatmap_tiles.invalidate_point(activity_update.longitude, activity_update.latitude)
+        nearby_activities_cache.invalidate_point(activity_update.longitude, activity_update.latitude)
+    invalidate_tags("activities", f"activity:{activity.id}")
+    invalidate_activity(activity.id)
 
     return activity_to_dict(activity, current_user.id, db)
 
@@ -363,32 +611,12 @@ async def delete_activity(
             detail="Doar creatorul poate șterge activitatea"
         )
 
+    latitude, longitude = point_lat_lng(activity.location)
     db.delete(activity)
     db.commit()
+    heatmap_tiles.invalidate_point(longitude, latitude)
+    nearby_activities_cache.invalidate_point(longitude, latitude)
+    invalidate_tags("activities", f"activity:{activity_id}")
+    invalidate_activity(activity_id)
 
     return {"message": "Activitate ștearsă cu succes"}
-
-@router.get("/by-county")
-def activities_by_county(db: Session = Depends(get_db)):
-    sql = """
-    SELECT
-        c.nuts_id,
-        c.name_latn,
-        COUNT(a.id) AS activity_count
-    FROM romania_counties c
-    LEFT JOIN activities a
-        ON a.location IS NOT NULL
-        AND ST_Contains(c.geom, a.location)
-    WHERE c.cntr_code = 'RO'
-    GROUP BY c.nuts_id, c.name_latn
-    """
-    rows = db.execute(sql).fetchall()
-
-    return [
-        {
-            "nuts_id": r.nuts_id,
-            "name": r.name_latn,
-            "activity_count": r.activity_count
-        }
-        for r in rows
-    ]
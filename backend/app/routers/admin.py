@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from app.models import User
+from app.dependencies import get_current_admin
+from app.slow_queries import slow_query_recorder
+from app.profiling import request_profiler
+
+router = APIRouter()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("max", pattern="^(max|total|count)$", description="max, total sau count"),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Obține query-urile lente (grupate pe formă), cu tipurile parametrilor și ultimul plan EXPLAIN capturat"""
+    return {
+        "threshold_ms": slow_query_recorder.threshold * 1000,
+        "dropped": slow_query_recorder.dropped,
+        "queries": slow_query_recorder.worst_offenders(limit, sort)
+    }
+
+
+@router.get("/profiles")
+async def get_profiles(
+    limit: int = Query(50, ge=1, le=200),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Obține profilurile de cereri salvate (cele mai noi primele)"""
+    return {
+        "sample_rate": request_profiler.sample_rate,
+        "profiles": request_profiler.list_profiles(limit)
+    }
+
+
+@router.get("/profiles/{profile_id}/{kind}")
+async def download_profile(
+    profile_id: str,
+    kind: str,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Descarcă un profil: folded (pentru flamegraph.pl / speedscope) sau json (metadate și alocări)"""
+    path = request_profiler.profile_path(profile_id, kind)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profilul nu a fost găsit"
+        )
+    media_type = "application/json" if kind == "json" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=f"{profile_id}.{kind}")
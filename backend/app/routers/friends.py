@@ -1,13 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from app.database import get_db
-from app.models import FriendRequest, User, FriendRequestStatus, ReadNotification
-from app.schemas import FriendRequestCreate, FriendRequestResponse, FriendRequestUpdate, UserResponse
+from app.models import FriendRequest, User, FriendRequestStatus, ReadNotification, Friendship, FriendSuggestion
+from app.schemas import (
+    FriendRequestCreate, FriendRequestResponse, FriendRequestUpdate, UserResponse, FriendSuggestionResponse
+)
 from app.dependencies import get_current_user
+from app.cache import Cache, invalidate_tags
+from app.entity_cache import get_users
+from app.geo import point_lat_lng
+from app.friendships import add_friendship, remove_friendship, are_friends, mutual_friend_ids_select
+from app.suggestions import (
+    refresh_user_suggestions, refresh_suggestions_in_background, drop_suggestion_pair,
+    affected_by_friendship_change, mark_suggestions_stale, needs_suggestions
+)
 
 router = APIRouter()
 
+# Lista de prieteni a fiecărui utilizator; invalidată la schimbări de prietenie sau de profil ale prietenilor
+friends_cache = Cache("friends", ttl_seconds=300, value_tag_families=("user:*",))
+
+
+def friend_to_dict(friend: User) -> dict:
+    """Convertește un User în dict pentru UserResponse (cu lat/lng)"""
+    latitude, longitude = point_lat_lng(friend.home_location)
+
+    return {
+        "id": friend.id,
+        "name": friend.name,
+        "email": friend.email,
+        "bio": friend.bio,
+        "interests": friend.interests,
+        "visibility_radius_km": friend.visibility_radius_km,
+        "created_at": friend.created_at,
+        "latitude": latitude,
+        "longitude": longitude
+    }
+
 
 @router.post("/requests", response_model=FriendRequestResponse, status_code=status.HTTP_201_CREATED)
 async def create_friend_request(
@@ -55,6 +85,8 @@ async def create_friend_request(
     )
 
     db.add(new_request)
+    # Utilizatorii cu o cerere între ei nu mai sunt sugerați unul altuia
+    drop_suggestion_pair(db, current_user.id, to_user.id)
     db.commit()
     db.refresh(new_request)
 
@@ -80,9 +112,10 @@ async def get_received_friend_requests(
         FriendRequest.status == FriendRequestStatus.PENDING
     ).all()
 
+    senders = get_users(db, {req.from_user_id for req in requests})
     result = []
     for req in requests:
-        from_user = db.query(User).filter(User.id == req.from_user_id).first()
+        from_user = senders.get(req.from_user_id)
         result.append({
             "id": req.id,
             "from_user_id": req.from_user_id,
@@ -107,9 +140,10 @@ async def get_sent_friend_requests(
         FriendRequest.status == FriendRequestStatus.PENDING
     ).all()
 
+    recipients = get_users(db, {req.to_user_id for req in requests})
     result = []
     for req in requests:
-        to_user = db.query(User).filter(User.id == req.to_user_id).first()
+        to_user = recipients.get(req.to_user_id)
         result.append({
             "id": req.id,
             "from_user_id": req.from_user_id,
@@ -127,6 +161,7 @@ async def get_sent_friend_requests(
 async def update_friend_request(
     request_id: int,
     friend_request_update: FriendRequestUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -145,10 +180,16 @@ async def update_friend_request(
             detail="Nu ai permisiunea să actualizezi această cerere"
         )
 
-    # Actualizează statusul
+    # Actualizează statusul și menține tabela friendships
+    friendship_changed = False
     if friend_request_update.status == "accepted":
+        friendship_changed = friend_request.status != FriendRequestStatus.ACCEPTED
         friend_request.status = FriendRequestStatus.ACCEPTED
+        add_friendship(db, friend_request.from_user_id, friend_request.to_user_id)
     elif friend_request_update.status == "rejected":
+        if friend_request.status == FriendRequestStatus.ACCEPTED:
+            friendship_changed = True
+            remove_friendship(db, friend_request.from_user_id, friend_request.to_user_id)
         friend_request.status = FriendRequestStatus.REJECTED
     else:
         raise HTTPException(
@@ -156,11 +197,22 @@ async def update_friend_request(
             detail="Status invalid. Folosește 'accepted' sau 'rejected'"
         )
 
+    # Prietenii comuni s-au schimbat pentru cei doi și pentru prietenii lor: cei doi sunt recalculați
+    # imediat, prietenii (pot fi sute) rămân pentru jobul de mentenanță
+    pair = {friend_request.from_user_id, friend_request.to_user_id}
+    if friendship_changed:
+        mark_suggestions_stale(db, affected_by_friendship_change(db, *pair) - pair)
+
     db.commit()
     db.refresh(friend_request)
 
-    from_user = db.query(User).filter(User.id == friend_request.from_user_id).first()
-    to_user = db.query(User).filter(User.id == friend_request.to_user_id).first()
+    if friendship_changed:
+        invalidate_tags(f"user:{friend_request.from_user_id}:friends", f"user:{friend_request.to_user_id}:friends")
+        background_tasks.add_task(refresh_suggestions_in_background, pair)
+
+    users = get_users(db, (friend_request.from_user_id, friend_request.to_user_id))
+    from_user = users.get(friend_request.from_user_id)
+    to_user = users.get(friend_request.to_user_id)
 
     return {
         "id": friend_request.id,
@@ -178,57 +230,91 @@ async def get_friends(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obține lista de prieteni (cereri acceptate)"""
-    # Găsește toate cererile acceptate unde utilizatorul curent este implicat
-    friend_requests = db.query(FriendRequest).filter(
-        or_(
-            (FriendRequest.from_user_id == current_user.id),
-            (FriendRequest.to_user_id == current_user.id)
-        ),
-        FriendRequest.status == FriendRequestStatus.ACCEPTED
-    ).all()
+    """Obține lista de prieteni"""
+    def load():
+        friends = db.query(User).join(
+            Friendship, Friendship.friend_id == User.id
+        ).filter(
+            Friendship.user_id == current_user.id
+        ).all()
+        return [friend_to_dict(friend) for friend in friends]
+
+    return await friends_cache.get_or_set_async(
+        current_user.id, load,
+        tags=(f"user:{current_user.id}:friends",),
+        value_tags=lambda result: {f"user:{friend['id']}" for friend in result}
+    )
 
-    friend_ids = set()
-    for req in friend_requests:
-        if req.from_user_id == current_user.id:
-            friend_ids.add(req.to_user_id)
-        else:
-            friend_ids.add(req.from_user_id)
 
-    friends = db.query(User).filter(User.id.in_(friend_ids)).all()
+@router.get("/suggestions", response_model=list[FriendSuggestionResponse])
+async def get_friend_suggestions(
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Obține sugestiile de prietenie precalculate, ordonate după scor"""
+    def load():
+        return db.query(FriendSuggestion, User).join(
+            User, User.id == FriendSuggestion.candidate_id
+        ).filter(
+            FriendSuggestion.user_id == current_user.id
+        ).order_by(FriendSuggestion.score.desc()).limit(limit).all()
+
+    rows = load()
+    if not rows and needs_suggestions(db, current_user.id):
+        # Sugestiile nu au fost calculate încă (ex. cont nou) - le calculăm acum; o listă calculată
+        # și goală rămâne goală până la următoarea schimbare
+        refresh_user_suggestions(db, current_user.id)
+        db.commit()
+        rows = load()
 
-    from geoalchemy2.shape import to_shape
     result = []
-    for friend in friends:
-        latitude = None
-        longitude = None
-        if friend.home_location:
-            point = to_shape(friend.home_location)
-            latitude = point.y
-            longitude = point.x
-
+    for suggestion, user in rows:
+        user_dict = friend_to_dict(user)
         result.append({
-            "id": friend.id,
-            "name": friend.name,
-            "email": friend.email,
-            "bio": friend.bio,
-            "interests": friend.interests,
-            "visibility_radius_km": friend.visibility_radius_km,
-            "created_at": friend.created_at,
-            "latitude": latitude,
-            "longitude": longitude
+            "id": user.id,
+            "name": user.name,
+            "bio": user.bio,
+            "interests": user.interests,
+            "latitude": user_dict["latitude"],
+            "longitude": user_dict["longitude"],
+            "mutual_friends_count": suggestion.mutual_friends,
+            "shared_interests_count": suggestion.shared_interests,
+            "distance_km": suggestion.distance_km,
+            "score": suggestion.score
         })
 
     return result
 
 
+@router.get("/{user_id}/mutual", response_model=list[UserResponse])
+async def get_mutual_friends(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Obține prietenii comuni cu un alt utilizator"""
+    mutual_friends = db.query(User).filter(
+        User.id.in_(mutual_friend_ids_select(current_user.id, user_id))
+    ).all()
+
+    return [friend_to_dict(friend) for friend in mutual_friends]
+
+
 @router.delete("/{friend_id}")
 async def remove_friend(
     friend_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Șterge o prietenie (șterge cererea de prietenie acceptată)"""
+    if not are_friends(db, current_user.id, friend_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Prietenie nu a fost găsită"
+        )
+
     # Găsește cererea de prietenie acceptată între utilizatorul curent și prieten
     friend_request = db.query(FriendRequest).filter(
         or_(
@@ -239,21 +325,23 @@ async def remove_friend(
         ),
         FriendRequest.status == FriendRequestStatus.ACCEPTED
     ).first()
-    
-    if not friend_request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Prietenie nu a fost găsită"
-        )
-    
-    # Șterge mai întâi toate notificările care referă această cerere de prietenie
-    db.query(ReadNotification).filter(
-        ReadNotification.friend_request_id == friend_request.id
-    ).delete()
-    
-    # Șterge cererea de prietenie
-    db.delete(friend_request)
+
+    if friend_request:
+        # Șterge mai întâi toate notificările care referă această cerere de prietenie
+        db.query(ReadNotification).filter(
+            ReadNotification.friend_request_id == friend_request.id
+        ).delete()
+
+        # Șterge cererea de prietenie
+        db.delete(friend_request)
+
+    pair = {current_user.id, friend_id}
+    mark_suggestions_stale(db, affected_by_friendship_change(db, current_user.id, friend_id) - pair)
+    remove_friendship(db, current_user.id, friend_id)
     db.commit()
+    invalidate_tags(f"user:{current_user.id}:friends", f"user:{friend_id}:friends")
+
+    background_tasks.add_task(refresh_suggestions_in_background, pair)
     
     return {"message": "Prietenie ștearsă cu succes"}
 
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.lifecycle import check_database
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def liveness():
+    """Procesul răspunde (nu atinge baza de date)"""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness(request: Request):
+    """Worker-ul a pornit, iar baza de date și PostGIS sunt disponibile"""
+    if not getattr(request.app.state, "started", False):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "starting"}
+        )
+    try:
+        checks = await run_in_threadpool(check_database)
+    except Exception as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "database": "error", "detail": type(e).__name__}
+        )
+    return {"status": "ready", "database": "ok", "postgis": checks["postgis"]}
@@ -1,14 +1,25 @@
+from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Message, Activity, Participation, ParticipationStatus, User
 from app.schemas import MessageCreate, MessageResponse, NotificationItem, NotificationsResponse
 from app.dependencies import get_current_user
+from app.rate_limit import rate_limit
+from app.cache import Cache, invalidate_tags
+from app.entity_cache import get_users
 
 router = APIRouter()
 
+# Marjă pentru limita inferioară a mesajelor unei activități (ceasuri diferite între scrieri)
+MESSAGES_CLOCK_SKEW = timedelta(days=1)
 
-@router.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
+# Mesajele unei activități (polling la 5s); invalidate la mesaj nou sau la schimbarea numelui unui expeditor
+messages_cache = Cache("activity_messages", ttl_seconds=300, value_tag_families=("user:*",))
+
+
+@router.post("/", response_model=MessageResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(rate_limit("messages.send"))])
 async def create_message(
     message_data: MessageCreate,
     db: Session = Depends(get_db),
@@ -47,6 +58,7 @@ async def create_message(
     db.add(new_message)
     db.commit()
     db.refresh(new_message)
+    invalidate_tags(f"activity:{new_message.activity_id}:messages")
 
     return {
         "id": new_message.id,
@@ -58,7 +70,8 @@ async def create_message(
     }
 
 
-@router.get("/activity/{activity_id}", response_model=list[MessageResponse])
+@router.get("/activity/{activity_id}", response_model=list[MessageResponse],
+            dependencies=[Depends(rate_limit("messages.poll"))])
 async def get_activity_messages(
     activity_id: int,
     db: Session = Depends(get_db),
@@ -87,13 +100,26 @@ async def get_activity_messages(
             detail="Trebuie să fii creator sau participant acceptat pentru a vedea mesajele"
         )
 
-    messages = db.query(Message).filter(
-        Message.activity_id == activity_id
-    ).order_by(Message.created_at.asc()).all()
+    # Accesul este verificat la fiecare cerere; doar lista de mesaje este din cache
+    return await messages_cache.get_or_set_async(
+        activity_id, lambda: load_activity_messages(db, activity),
+        tags=(f"activity:{activity_id}:messages",),
+        value_tags=lambda result: {f"user:{msg['sender_id']}" for msg in result}
+    )
+
+
+def load_activity_messages(db: Session, activity: Activity) -> list:
+    """Mesajele unei activități, în ordine cronologică, cu numele expeditorului"""
+    # Mesajele nu pot preceda activitatea: limita inferioară exclude partițiile lunilor anterioare
+    messages = db.query(Message).filter(Message.activity_id == activity.id)
+    if activity.created_at:
+        messages = messages.filter(Message.created_at >= activity.created_at - MESSAGES_CLOCK_SKEW)
+    messages = messages.order_by(Message.created_at.asc()).all()
 
+    senders = get_users(db, {msg.sender_id for msg in messages})
     result = []
     for msg in messages:
-        sender = db.query(User).filter(User.id == msg.sender_id).first()
+        sender = senders.get(msg.sender_id)
         result.append({
             "id": msg.id,
             "activity_id": msg.activity_id,
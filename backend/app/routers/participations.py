@@ -1,12 +1,59 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import func, update, or_
+from sqlalchemy.dialects.postgresql import insert
 from app.database import get_db
-from app.models import Participation, Activity, User, ParticipationStatus, ReadNotification, Message, FriendRequest
+from app.models import Participation, Activity, User, ParticipationStatus, ReadNotification, Message, FriendRequest, MessageReadMark
 from app.schemas import ParticipationCreate, ParticipationResponse, ParticipationUpdate, NotificationItem, NotificationsResponse
 from app.dependencies import get_current_user
+from app.rate_limit import rate_limit
+from app.cache import Cache, invalidate_tags
+from app.entity_cache import get_users, get_activities, user_name
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Participările unei activități (lista creatorului); invalidate la orice schimbare de participare
+participations_cache = Cache("activity_participations", ttl_seconds=300, value_tag_families=("user:*",))
+
+
+def reserve_seat(db: Session, activity_id: int) -> bool:
+    """Ocupă atomic un loc în activitate; returnează False dacă activitatea este plină"""
+    # Condiția și incrementul sunt evaluate în același UPDATE (row lock), deci
+    # accept-urile concurente nu pot depăși max_people
+    new_count = db.execute(
+        update(Activity)
+        .where(
+            Activity.id == activity_id,
+            or_(Activity.max_people.is_(None), Activity.accepted_count < Activity.max_people)
+        )
+        .values(accepted_count=Activity.accepted_count + 1)
+        .returning(Activity.accepted_count)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    return new_count is not None
+
+
+def release_seat(db: Session, activity_id: int) -> None:
+    """Eliberează atomic un loc ocupat în activitate"""
+    db.execute(
+        update(Activity)
+        .where(Activity.id == activity_id, Activity.accepted_count > 0)
+        .values(accepted_count=Activity.accepted_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_message_read_marks(db: Session, user_id: int, activity_ids: list) -> dict:
+    """Returnează ultimul mesaj citit per (activitate, expeditor) pentru un utilizator"""
+    marks = db.query(MessageReadMark).filter(
+        MessageReadMark.user_id == user_id,
+        MessageReadMark.activity_id.in_(activity_ids)
+    ).all()
+    return {(mark.activity_id, mark.sender_id): mark.last_read_message_id for mark in marks}
+
 
 @router.post("/", response_model=ParticipationResponse, status_code=status.HTTP_201_CREATED)
 async def create_participation(
@@ -44,11 +91,7 @@ async def create_participation(
 
     # Verifică dacă activitatea are locuri disponibile
     if activity.max_people:
-        accepted_count = db.query(Participation).filter(
-            Participation.activity_id == activity.id,
-            Participation.status == ParticipationStatus.ACCEPTED
-        ).count()
-        if accepted_count >= activity.max_people:
+        if activity.accepted_count >= activity.max_people:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Activitatea este plină"
@@ -64,6 +107,7 @@ async def create_participation(
     db.add(new_participation)
     db.commit()
     db.refresh(new_participation)
+    invalidate_tags(f"activity:{new_participation.activity_id}:participations")
 
     return {
         "id": new_participation.id,
@@ -97,13 +141,23 @@ async def get_activity_participations(
             detail="Doar creatorul activității poate vedea participările"
         )
 
+    return await participations_cache.get_or_set_async(
+        activity_id, lambda: load_activity_participations(db, activity_id),
+        tags=(f"activity:{activity_id}:participations",),
+        value_tags=lambda result: {f"user:{part['user_id']}" for part in result}
+    )
+
+
+def load_activity_participations(db: Session, activity_id: int) -> list:
+    """Participările unei activități, cu numele utilizatorilor"""
     participations = db.query(Participation).filter(
         Participation.activity_id == activity_id
     ).all()
 
+    users = get_users(db, {part.user_id for part in participations})
     result = []
     for part in participations:
-        user = db.query(User).filter(User.id == part.user_id).first()
+        user = users.get(part.user_id)
         result.append({
             "id": part.id,
             "activity_id": part.activity_id,
@@ -124,7 +178,10 @@ async def update_participation(
     current_user: User = Depends(get_current_user)
 ):
     """Actualizează statusul unei participări (accept/reject)"""
-    participation = db.query(Participation).filter(Participation.id == participation_id).first()
+    # Blochează participarea pentru ca două accept-uri simultane să nu ocupe două locuri
+    participation = db.query(Participation).filter(
+        Participation.id == participation_id
+    ).with_for_update().first()
     if not participation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -139,21 +196,19 @@ async def update_participation(
             detail="Doar creatorul activității poate aproba/respinge participările"
         )
 
-    # Actualizează statusul
+    # Actualizează statusul (locul se ocupă/eliberează în aceeași tranzacție)
     if participation_update.status == "accepted":
-        participation.status = ParticipationStatus.ACCEPTED
-        # Verifică dacă activitatea este plină
-        if activity.max_people:
-            accepted_count = db.query(Participation).filter(
-                Participation.activity_id == activity.id,
-                Participation.status == ParticipationStatus.ACCEPTED
-            ).count()
-            if accepted_count >= activity.max_people:
+        if participation.status != ParticipationStatus.ACCEPTED:
+            if not reserve_seat(db, activity.id):
+                db.rollback()
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Activitatea este deja plină"
                 )
+            participation.status = ParticipationStatus.ACCEPTED
     elif participation_update.status == "rejected":
+        if participation.status == ParticipationStatus.ACCEPTED:
+            release_seat(db, activity.id)
         participation.status = ParticipationStatus.REJECTED
     else:
         raise HTTPException(
@@ -163,13 +218,14 @@ async def update_participation(
 
     db.commit()
     db.refresh(participation)
+    # Locurile ocupate intră și în statisticile generale
+    invalidate_tags(f"activity:{participation.activity_id}:participations", "participations")
 
-    user = db.query(User).filter(User.id == participation.user_id).first()
     return {
         "id": participation.id,
         "activity_id": participation.activity_id,
         "user_id": participation.user_id,
-        "user_name": user.name if user else None,
+        "user_name": user_name(db, participation.user_id),
         "status": participation.status.value,
         "joined_at": participation.joined_at
     }
@@ -182,7 +238,9 @@ async def delete_participation(
     current_user: User = Depends(get_current_user)
 ):
     """Anulează o participare"""
-    participation = db.query(Participation).filter(Participation.id == participation_id).first()
+    participation = db.query(Participation).filter(
+        Participation.id == participation_id
+    ).with_for_update().first()
     if not participation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -198,8 +256,13 @@ async def delete_participation(
                 detail="Nu ai permisiunea să ștergi această participare"
             )
 
+    if participation.status == ParticipationStatus.ACCEPTED:
+        release_seat(db, participation.activity_id)
+
+    activity_id = participation.activity_id
     db.delete(participation)
     db.commit()
+    invalidate_tags(f"activity:{activity_id}:participations", "participations")
 
     return {"message": "Participare anulată cu succes"}
 
@@ -228,7 +291,7 @@ async def get_my_participations(
     return result
 
 
-@router.get("/notifications/count")
+@router.get("/notifications/count", dependencies=[Depends(rate_limit("notifications.poll"))])
 async def get_notifications_count(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -294,27 +357,15 @@ async def get_notifications_count(
     # Combină activitățile create și cele la care participă
     all_relevant_activity_ids = list(set(activity_ids + participated_activity_ids))
     
-    # DEBUG: Log pentru a vedea ce activități sunt relevante
-    print(f"[DEBUG NOTIFICATIONS COUNT] User {current_user.id} ({current_user.name}):")
-    print(f"  - Created activities: {activity_ids}")
-    print(f"  - Participated activities: {participated_activity_ids}")
-    print(f"  - All relevant activities: {all_relevant_activity_ids}")
-    
     if all_relevant_activity_ids:
         yesterday = datetime.utcnow() - timedelta(hours=24)
         recent_messages = db.query(Message).filter(
             Message.activity_id.in_(all_relevant_activity_ids),
             Message.sender_id != current_user.id,
             Message.created_at >= yesterday
-        ).order_by(Message.created_at.desc()).all()
-        
-        # DEBUG: Log pentru a vedea ce mesaje sunt găsite
-        print(f"  - Recent messages found: {len(recent_messages)}")
-        for msg in recent_messages:
-            sender = db.query(User).filter(User.id == msg.sender_id).first()
-            activity = db.query(Activity).filter(Activity.id == msg.activity_id).first()
-            print(f"    * Message {msg.id} from {sender.name if sender else 'Unknown'} (ID: {msg.sender_id}) in activity {msg.activity_id} ('{activity.title if activity else 'Unknown'}') at {msg.created_at}")
-        
+        ).order_by(Message.created_at.desc(), Message.id.desc()).all()
+        read_marks = get_message_read_marks(db, current_user.id, all_relevant_activity_ids)
+
         # Grupează mesajele pe activitate și utilizator (doar ultimul mesaj per combinație)
         # IMPORTANT: Pentru mesaje, verificăm dacă ultimul mesaj NOU de la acel sender în acea activitate
         # a fost deja marcat ca citit. Dacă da, nu mai generăm notificare.
@@ -323,41 +374,26 @@ async def get_notifications_count(
             key = (msg.activity_id, msg.sender_id)
             if key not in seen_combinations:
                 seen_combinations.add(key)
-                # Găsește ultimul mesaj NOU (din ultimele 24h) de la acest sender în acea activitate
-                latest_message = db.query(Message).filter(
-                    Message.activity_id == msg.activity_id,
-                    Message.sender_id == msg.sender_id,
-                    Message.created_at >= yesterday
-                ).order_by(Message.created_at.desc()).first()
+                # Mesajele sunt ordonate descrescător, deci primul mesaj din combinație este cel mai nou
+                latest_message = msg
                 
-                # Verifică dacă ultimul mesaj NOU a fost deja marcat ca citit
-                has_read_notification = False
-                if latest_message:
-                    has_read_notification = db.query(ReadNotification).filter(
-                        ReadNotification.user_id == current_user.id,
-                        ReadNotification.notification_type == "new_message",
-                        ReadNotification.notification_id == latest_message.id
-                    ).first() is not None
+                # Necitit dacă este după ultimul mesaj citit (high-water mark)
+                has_read_notification = latest_message.id <= read_marks.get(key, 0)
                 
                 if not has_read_notification:
                     count += 1
-                    # DEBUG: Log pentru a vedea ce notificări sunt numărate
-                    sender = db.query(User).filter(User.id == msg.sender_id).first()
-                    activity = db.query(Activity).filter(Activity.id == msg.activity_id).first()
-                    print(f"    -> ✓ Counting notification for message {latest_message.id if latest_message else 'N/A'} from {sender.name if sender else 'Unknown'} in activity {msg.activity_id} ('{activity.title if activity else 'Unknown'}')")
-                else:
-                    # DEBUG: Log pentru a vedea ce notificări sunt excluse
-                    sender = db.query(User).filter(User.id == msg.sender_id).first()
-                    activity = db.query(Activity).filter(Activity.id == msg.activity_id).first()
-                    print(f"    -> ✗ Skipping notification (latest message {latest_message.id if latest_message else 'N/A'} already read) for message from {sender.name if sender else 'Unknown'} in activity {msg.activity_id} ('{activity.title if activity else 'Unknown'}')")
-    
+
+        logger.debug("Notificări user %d: %d activități relevante, %d mesaje recente",
+                     current_user.id, len(all_relevant_activity_ids), len(recent_messages))
+
     return {
         "count": count,
         "pending_participations": pending_count
     }
 
 
-@router.get("/notifications", response_model=NotificationsResponse)
+@router.get("/notifications", response_model=NotificationsResponse,
+            dependencies=[Depends(rate_limit("notifications.poll"))])
 async def get_notifications(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -384,11 +420,12 @@ async def get_notifications(
         FriendRequest.status == FriendRequestStatus.PENDING
     ).order_by(FriendRequest.created_at.desc()).all()
     
+    senders = get_users(db, {req.from_user_id for req in received_friend_requests})
     for req in received_friend_requests:
         if ("friend_request_received", req.id) in read_keys:
             continue
         
-        from_user = db.query(User).filter(User.id == req.from_user_id).first()
+        from_user = senders.get(req.from_user_id)
         if from_user:
             notifications.append(NotificationItem(
                 id=req.id,
@@ -409,11 +446,12 @@ async def get_notifications(
         FriendRequest.created_at >= yesterday  # Doar cele acceptate recent
     ).order_by(FriendRequest.created_at.desc()).all()
     
+    recipients = get_users(db, {req.to_user_id for req in accepted_friend_requests})
     for req in accepted_friend_requests:
         if ("friend_request_accepted", req.id) in read_keys:
             continue
         
-        to_user = db.query(User).filter(User.id == req.to_user_id).first()
+        to_user = recipients.get(req.to_user_id)
         if to_user:
             notifications.append(NotificationItem(
                 id=req.id,
@@ -432,14 +470,17 @@ async def get_notifications(
             Participation.activity_id.in_(activity_ids),
             Participation.status == ParticipationStatus.PENDING
         ).order_by(Participation.joined_at.desc()).all()
+        # Titlurile și numele vin din cache-ul de entități, într-un singur pas pentru toată lista
+        activities = get_activities(db, {part.activity_id for part in pending_participations})
+        users = get_users(db, {part.user_id for part in pending_participations})
         
         for part in pending_participations:
             # Verifică dacă notificarea a fost deja citită
             if ("participation_request", part.id) in read_keys:
                 continue
                 
-            activity = db.query(Activity).filter(Activity.id == part.activity_id).first()
-            user = db.query(User).filter(User.id == part.user_id).first()
+            activity = activities.get(part.activity_id)
+            user = users.get(part.user_id)
             
             if activity and user:
                 notifications.append(NotificationItem(
@@ -470,7 +511,10 @@ async def get_notifications(
             Message.activity_id.in_(all_relevant_activity_ids),
             Message.sender_id != current_user.id,
             Message.created_at >= yesterday
-        ).order_by(Message.created_at.desc()).all()
+        ).order_by(Message.created_at.desc(), Message.id.desc()).all()
+        read_marks = get_message_read_marks(db, current_user.id, all_relevant_activity_ids)
+        activities = get_activities(db, {msg.activity_id for msg in recent_messages})
+        senders = get_users(db, {msg.sender_id for msg in recent_messages})
         
         # Grupează mesajele pe activitate și utilizator (doar ultimul mesaj per combinație)
         # IMPORTANT: Pentru mesaje, verificăm dacă ultimul mesaj NOU de la acel sender în acea activitate
@@ -480,27 +524,15 @@ async def get_notifications(
             key = (msg.activity_id, msg.sender_id)
             if key not in seen_combinations:
                 seen_combinations.add(key)
-                # Găsește ultimul mesaj NOU (din ultimele 24h) de la acest sender în acea activitate
-                latest_message = db.query(Message).filter(
-                    Message.activity_id == msg.activity_id,
-                    Message.sender_id == msg.sender_id,
-                    Message.created_at >= yesterday
-                ).order_by(Message.created_at.desc()).first()
+                # Mesajele sunt ordonate descrescător, deci primul mesaj din combinație este cel mai nou
+                latest_message = msg
                 
-                # Verifică dacă ultimul mesaj NOU a fost deja marcat ca citit
-                has_read_notification = False
-                if latest_message:
-                    has_read_notification = db.query(ReadNotification).filter(
-                        ReadNotification.user_id == current_user.id,
-                        ReadNotification.notification_type == "new_message",
-                        ReadNotification.notification_id == latest_message.id
-                    ).first() is not None
-                
-                if has_read_notification:
+                # Necitit dacă este după ultimul mesaj citit (high-water mark)
+                if latest_message.id <= read_marks.get(key, 0):
                     continue
                     
-                activity = db.query(Activity).filter(Activity.id == msg.activity_id).first()
-                sender = db.query(User).filter(User.id == msg.sender_id).first()
+                activity = activities.get(msg.activity_id)
+                sender = senders.get(msg.sender_id)
                 
                 if activity and sender and latest_message:
                     notifications.append(NotificationItem(
@@ -558,7 +590,7 @@ async def mark_notification_as_read(
                     detail=f"Cerere de prietenie cu ID {notification_id} nu a fost găsită"
                 )
         except Exception as e:
-            print(f"[ERROR] Eroare la găsirea cererii de prietenie {notification_id}: {e}")
+            logger.exception("Eroare la găsirea cererii de prietenie %d", notification_id)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Eroare la procesarea notificării: {str(e)}"
@@ -571,36 +603,33 @@ async def mark_notification_as_read(
             detail="Notificare nu a fost găsită"
         )
     
-    # Pentru mesaje, marchem doar mesajele NOI (din ultimele 24h) de la acel sender în acea activitate ca citite
-    # (pentru a fi consistent cu logica de grupare și pentru a permite notificări pentru mesaje noi ulterioare)
+    # Pentru mesaje, mutăm high-water mark-ul la ultimul mesaj al acelui sender în acea activitate
+    # (toate mesajele existente devin citite, iar mesajele noi ulterioare generează din nou notificare)
     if notification_type == "new_message" and sender_id:
-        from datetime import datetime, timedelta
-        yesterday = datetime.utcnow() - timedelta(hours=24)
-        
-        # Găsește doar mesajele NOI (din ultimele 24h) de la acest sender în acea activitate
-        new_messages = db.query(Message).filter(
+        from datetime import datetime
+        latest_message_id = db.query(func.max(Message.id)).filter(
             Message.activity_id == activity_id,
-            Message.sender_id == sender_id,
-            Message.created_at >= yesterday
-        ).all()
+            Message.sender_id == sender_id
+        ).scalar() or notification_id
         
-        # Marchează fiecare mesaj NOU ca citit (dacă nu este deja marcat)
-        for msg in new_messages:
-            existing = db.query(ReadNotification).filter(
-                ReadNotification.user_id == current_user.id,
-                ReadNotification.notification_type == "new_message",
-                ReadNotification.notification_id == msg.id
-            ).first()
-            
-            if not existing:
-                read_notification = ReadNotification(
-                    user_id=current_user.id,
-                    notification_type="new_message",
-                    notification_id=msg.id,
-                    activity_id=activity_id,
-                    friend_request_id=None
-                )
-                db.add(read_notification)
+        # Upsert atomic; GREATEST nu permite mutarea mark-ului înapoi
+        stmt = insert(MessageReadMark).values(
+            user_id=current_user.id,
+            activity_id=activity_id,
+            sender_id=sender_id,
+            last_read_message_id=latest_message_id,
+            updated_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MessageReadMark.user_id, MessageReadMark.activity_id, MessageReadMark.sender_id],
+            set_={
+                "last_read_message_id": func.greatest(
+                    MessageReadMark.last_read_message_id, stmt.excluded.last_read_message_id
+                ),
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        db.execute(stmt)
     elif notification_type == "participation_request":
         # Pentru participation_request, marchează doar cererea specifică
         existing = db.query(ReadNotification).filter(
@@ -1,17 +1,98 @@
+import logging
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from geoalchemy2.shape import to_shape
+from sqlalchemy import func, cast, or_, Text
+from geoalchemy2 import Geography
 from typing import Optional, List
 from app.database import get_db
 from app.models import User
-from app.schemas import NearbyUsersRequest, NearbyUsersResponse
+from app.schemas import NearbyUsersRequest, NearbyUsersResponse, UserSearchResponse
 from app.dependencies import get_current_user
+from app.rate_limit import rate_limit
+from app.geocache import nearby_user_distances, within_radius, SPHEROID_MARGIN
+from app.geo import make_point, point_lat_lng, lat_lng_columns
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Câți candidați (după similaritate) sunt reordonați cu boost-ul de proximitate
+FUZZY_CANDIDATES_LIMIT = 100
+# Boost maxim adăugat la similaritate pentru utilizatorii foarte apropiați
+PROXIMITY_BOOST = 0.3
+# Distanța (km) la care boost-ul scade la ~37%
+PROXIMITY_SCALE_KM = 25
+
+
+@router.get("/users", response_model=list[UserSearchResponse], dependencies=[Depends(rate_limit("search"))])
+async def search_users(
+    q: str = Query(..., min_length=2, max_length=100, description="Nume (sau parte din nume)"),
+    latitude: Optional[float] = Query(None, description="Latitudine pentru boost de proximitate"),
+    longitude: Optional[float] = Query(None, description="Longitudine pentru boost de proximitate"),
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Caută utilizatori după nume, tolerant la greșeli de scriere (pg_trgm)"""
+    # Aceeași normalizare ca index-ul ix_users_name_trgm
+    name_normalized = func.se_unaccent(func.lower(User.name))
+    q_normalized = func.se_unaccent(func.lower(q))
+    similarity = func.word_similarity(q_normalized, name_normalized)
+
+    candidates = db.query(
+        User.id.label("id"),
+        similarity.label("similarity")
+    ).filter(
+        User.id != current_user.id,
+        q_normalized.op("<%")(name_normalized)
+    ).order_by(similarity.desc()).limit(FUZZY_CANDIDATES_LIMIT).subquery()
+
+    # Boost de proximitate: locația din query sau locația de acasă a utilizatorului curent
+    if latitude is None or longitude is None:
+        latitude, longitude = point_lat_lng(current_user.home_location)
+
+    columns = [
+        User.id, User.name, User.bio, User.interests,
+        *lat_lng_columns(User.home_location),
+        candidates.c.similarity
+    ]
+    score = candidates.c.similarity
+    if latitude is not None and longitude is not None:
+        reference_point = cast(make_point(longitude, latitude), Geography)
+        distance_km = func.ST_Distance(cast(User.home_location, Geography), reference_point) / 1000.0
+        score = score + PROXIMITY_BOOST * func.coalesce(func.exp(-distance_km / PROXIMITY_SCALE_KM), 0)
+        columns.append(distance_km.label("distance_km"))
 
-@router.get("/users/nearby", response_model=list[NearbyUsersResponse])
+    rows = db.query(*columns).join(
+        candidates, candidates.c.id == User.id
+    ).order_by(score.desc()).limit(limit).all()
+
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "bio": row.bio,
+            "interests": row.interests,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "distance_km": getattr(row, "distance_km", None),
+            "similarity": row.similarity
+        }
+        for row in rows
+    ]
+
+
+def _filter_interests(query, interests: str):
+    """Filtrare după interese separate prin virgulă (potrivire pe textul listei JSON)"""
+    interest_list = [i.strip().lower() for i in interests.split(",") if i.strip()]
+    if not interest_list:
+        return query
+    interests_text = func.lower(cast(User.interests, Text))
+    return query.filter(or_(*[interests_text.contains(interest, autoescape=True) for interest in interest_list]))
+
+
+@router.get("/users/nearby", response_model=list[NearbyUsersResponse],
+            dependencies=[Depends(rate_limit("search"))])
 async def get_nearby_users(
     latitude: float = Query(..., description="Latitudine"),
     longitude: float = Query(..., description="Longitudine"),
@@ -21,88 +102,61 @@ async def get_nearby_users(
     current_user: User = Depends(get_current_user)
 ):
     """Găsește utilizatori în apropiere folosind query spațial PostGIS"""
-    print(f"[DEBUG SEARCH] User {current_user.id} ({current_user.name}) caută utilizatori la lat={latitude}, lng={longitude}, radius={radius_km}km")
-    
-    # Convertim km în metri pentru ST_DWithin
-    distance_meters = radius_km * 1000
-
-    # Verifică câți utilizatori există în total
-    total_users = db.query(User).filter(User.id != current_user.id).count()
-    users_with_location = db.query(User).filter(
-        User.id != current_user.id,
-        User.home_location.isnot(None)
-    ).count()
-    print(f"[DEBUG SEARCH] Total utilizatori (fără current): {total_users}, cu locație: {users_with_location}")
+    # Candidații din celula geohash (împărțiți între cereri apropiate); interesele și utilizatorul
+    # curent sunt filtrate în query-ul pe id-uri, distanța exactă este cea din cache
+    distances = nearby_user_distances(db, latitude, longitude, radius_km)
+    if distances is not None:
+        query = db.query(User.id, User.name, User.bio, User.interests).filter(
+            User.id.in_(list(distances)),
+            User.id != current_user.id
+        )
+        if interests:
+            query = _filter_interests(query, interests)
+        rows = sorted(query.all(), key=lambda row: distances[row.id][2])
+        return [
+            {
+                "id": row.id,
+                "name": row.name,
+                "bio": row.bio,
+                "interests": row.interests,
+                "latitude": distances[row.id][0],
+                "longitude": distances[row.id][1],
+                "distance_km": distances[row.id][2]
+            }
+            for row in rows
+        ]
+
+    # Query direct (rază mare sau celulă densă): ST_DWithin pe elipsoid cu o mică margine, apoi aceeași
+    # distanță haversine și ordonare ca pentru răspunsurile din cache
+    distance_meters = radius_km * SPHEROID_MARGIN * 1000
 
-    # Folosim ST_DWithin cu geografie pentru calcul corect al distanței pe sferă
-    from sqlalchemy import text
-    query = db.query(User).filter(
+    reference_point = cast(make_point(longitude, latitude), Geography)
+    user_point = cast(User.home_location, Geography)
+    query = db.query(
+        User.id, User.name, User.bio, User.interests,
+        *lat_lng_columns(User.home_location)
+    ).filter(
         User.id != current_user.id,  # Exclude utilizatorul curent
         User.home_location.isnot(None),
-        text("ST_DWithin("
-             "ST_GeogFromWKB(ST_AsBinary(users.home_location)), "
-             "ST_GeogFromText(:ref_point), "
-             ":distance_meters)"
-        ).bindparams(
-            ref_point=f"POINT({longitude} {latitude})",
-            distance_meters=distance_meters
-        )
+        func.ST_DWithin(user_point, reference_point, distance_meters)
     )
 
-    # Filtrare după interese dacă sunt specificate
     if interests:
-        interest_list = [i.strip().lower() for i in interests.split(",")]
-        # Filtrare simplificată - verifică dacă interesele utilizatorului se suprapun
-        # Aceasta funcționează dacă interesele sunt stocate ca listă JSON
-        conditions = []
-        for interest in interest_list:
-            conditions.append(f"LOWER(interests::text) LIKE '%{interest}%'")
-        if conditions:
-            query = query.filter(text(" OR ".join(conditions)))
-
-    users = query.all()
-    print(f"[DEBUG SEARCH] Găsiți {len(users)} utilizatori în apropiere")
-
-    result = []
-    ref_point_text = f"POINT({longitude} {latitude})"
-    
-    for user in users:
-        if user.home_location:
-            point = to_shape(user.home_location)
-            # Calculează distanța folosind geografie pentru calcul corect pe sferă
-            # Folosim query direct cu ST_AsBinary din coloana existentă
-            try:
-                distance_result = db.execute(
-                    text("SELECT ST_Distance("
-                         "ST_GeogFromWKB(ST_AsBinary(users.home_location)), "
-                         "ST_GeogFromText(:ref_point)"
-                         ") as distance "
-                         "FROM users WHERE users.id = :user_id"),
-                    {
-                        "ref_point": ref_point_text,
-                        "user_id": user.id
-                    }
-                ).scalar()
-                
-                # Convertim din metri în km
-                distance_km = distance_result / 1000.0 if distance_result else None
-            except Exception as e:
-                print(f"[DEBUG SEARCH] Eroare la calcularea distanței pentru user {user.id}: {e}")
-                # Dacă calculul distanței eșuează, folosim None
-                distance_km = None
-
-            result.append({
-                "id": user.id,
-                "name": user.name,
-                "bio": user.bio,
-                "interests": user.interests,
-                "latitude": point.y,
-                "longitude": point.x,
-                "distance_km": distance_km
-            })
-
-    # Sortează după distanță
-    result.sort(key=lambda x: x["distance_km"] if x["distance_km"] else float('inf'))
-
-    return result
+        query = _filter_interests(query, interests)
+
+    rows = within_radius(latitude, longitude, radius_km, ((row, row.latitude, row.longitude) for row in query.all()))
+    logger.debug("User %d caută utilizatori la lat=%s, lng=%s, radius=%skm: %d găsiți",
+                 current_user.id, latitude, longitude, radius_km, len(rows))
 
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "bio": row.bio,
+            "interests": row.interests,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "distance_km": distance
+        }
+        for row, distance in rows
+    ]
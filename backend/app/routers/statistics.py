@@ -4,18 +4,41 @@ from sqlalchemy import func, extract, and_
 from datetime import datetime, timedelta
 from typing import List, Dict
 from app.database import get_db
-from app.models import Activity, User, Participation, ParticipationStatus, FriendRequest
+from app.models import Activity, User, Participation, ParticipationStatus
 from app.dependencies import get_current_user
+from app.friendships import count_friends
+from app.rate_limit import rate_limit, concurrency_limiters
+from app.cache import Cache
 
 router = APIRouter()
 
+# Statisticile generale sunt aceleași pentru toți utilizatorii
+statistics_cache = Cache("statistics", ttl_seconds=60)
+GENERAL_STATISTICS_TAGS = ("activities", "participations")
 
-@router.get("/general")
+
+@router.get("/general", dependencies=[Depends(rate_limit("statistics"))])
 async def get_general_statistics(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Statistici generale pentru dashboard"""
+    # Servite din cache până la TTL sau la o scriere pe activități/participări; cererile simultane
+    # împart un singur calcul, iar limita de concurență se aplică doar calculelor efective
+    def compute():
+        with concurrency_limiters["statistics.general"].slot():
+            return compute_general_statistics(db)
+
+    return await statistics_cache.get_or_set_async("general", compute, tags=GENERAL_STATISTICS_TAGS)
+
+
+def warm_statistics_cache(db: Session) -> None:
+    """Umple cache-ul statisticilor generale (la pornirea worker-ului)"""
+    statistics_cache.get_or_set("general", lambda: compute_general_statistics(db), tags=GENERAL_STATISTICS_TAGS)
+
+
+def compute_general_statistics(db: Session) -> dict:
+    """Totalurile globale, activitățile pe categorii și evoluția pe ultimele 6 luni"""
     
     # Total activități
     total_activities = db.query(func.count(Activity.id)).scalar() or 0
@@ -96,7 +119,7 @@ async def get_general_statistics(
     }
 
 
-@router.get("/personal")
+@router.get("/personal", dependencies=[Depends(rate_limit("statistics"))])
 async def get_personal_statistics(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -190,14 +213,7 @@ async def get_personal_statistics(
     
     # Prietenii noi în ultimele 3 luni
     three_months_ago = datetime.utcnow() - timedelta(days=90)
-    new_friends = db.query(func.count(FriendRequest.id)).filter(
-        and_(
-            ((FriendRequest.from_user_id == current_user.id) |
-             (FriendRequest.to_user_id == current_user.id)),
-            FriendRequest.status == "accepted",
-            FriendRequest.created_at >= three_months_ago
-        )
-    ).scalar() or 0
+    new_friends = count_friends(db, current_user.id, since=three_months_ago)
     
     # Top 5 activități cu cele mai multe participări (create de utilizator)
     top_activities = db.query(
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from geoalchemy2 import WKTElement
-from geoalchemy2.shape import to_shape
-from shapely.geometry import Point
 from app.database import get_db
-from app.models import User, Activity, Participation, FriendRequest
+from app.models import User, Activity, Participation
 from app.schemas import UserResponse, UserUpdate, UserProfileResponse
 from app.dependencies import get_current_user
+from app.geo import make_point, point_lat_lng
+from app.geocache import nearby_users_cache
+from app.cache import invalidate_tags
+from app.entity_cache import invalidate_user
+from app.friendships import count_friends
+from app.suggestions import refresh_suggestions_in_background, affected_by_profile_change, mark_suggestions_stale
 
 router = APIRouter()
 
@@ -19,12 +22,7 @@ async def get_current_user_info(
 ):
     """Obține informații despre utilizatorul curent"""
     # Convertim locația în lat/lng
-    latitude = None
-    longitude = None
-    if current_user.home_location:
-        point = to_shape(current_user.home_location)
-        latitude = point.y
-        longitude = point.x
+    latitude, longitude = point_lat_lng(current_user.home_location)
 
     # Numără activitățile create
     created_count = db.query(func.count(Activity.id)).filter(
@@ -37,14 +35,8 @@ async def get_current_user_info(
         Participation.status == "accepted"
     ).scalar() or 0
 
-    # Numără prietenii (cereri acceptate)
-    friends_count = (
-        db.query(func.count(FriendRequest.id)).filter(
-            ((FriendRequest.from_user_id == current_user.id) |
-             (FriendRequest.to_user_id == current_user.id)),
-            FriendRequest.status == "accepted"
-        ).scalar() or 0
-    )
+    # Numără prietenii
+    friends_count = count_friends(db, current_user.id)
 
     return {
         "id": current_user.id,
@@ -65,6 +57,7 @@ async def get_current_user_info(
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
     user_update: UserUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -79,20 +72,34 @@ async def update_current_user(
         current_user.visibility_radius_km = user_update.visibility_radius_km
 
     # Actualizează locația dacă este furnizată
-    if user_update.latitude is not None and user_update.longitude is not None:
-        point = Point(user_update.longitude, user_update.latitude)
-        current_user.home_location = WKTElement(point.wkt, srid=4326)
+    location_changed = user_update.latitude is not None and user_update.longitude is not None
+    if location_changed:
+        old_latitude, old_longitude = point_lat_lng(current_user.home_location)
+        current_user.home_location = make_point(user_update.longitude, user_update.latitude)
+
+    # Locația și interesele intră în scorul sugestiilor de prietenie; cei care îl au ca sugestie
+    # sunt recalculați de jobul de mentenanță
+    suggestions_changed = location_changed or user_update.interests is not None
+    if suggestions_changed:
+        mark_suggestions_stale(db, affected_by_profile_change(db, current_user.id) - {current_user.id})
 
     db.commit()
     db.refresh(current_user)
+    # Proiecția din cache-ul de entități întâi: listele invalidate mai jos se recalculează cu numele nou
+    invalidate_user(current_user.id)
+    # Numele și profilul apar în listele din cache (mesaje, participări, prieteni)
+    invalidate_tags(f"user:{current_user.id}")
+
+    # Celulele nearby care conțineau locația veche sau o conțin pe cea nouă
+    if location_changed:
+        nearby_users_cache.invalidate_point(old_longitude, old_latitude)
+        nearby_users_cache.invalidate_point(user_update.longitude, user_update.latitude)
+
+    if suggestions_changed:
+        background_tasks.add_task(refresh_suggestions_in_background, (current_user.id,))
 
     # Convertim locația în lat/lng pentru response
-    latitude = None
-    longitude = None
-    if current_user.home_location:
-        point = to_shape(current_user.home_location)
-        latitude = point.y
-        longitude = point.x
+    latitude, longitude = point_lat_lng(current_user.home_location)
 
     return {
         "id": current_user.id,
@@ -122,12 +129,7 @@ async def get_user(
         )
 
     # Convertim locația în lat/lng
-    latitude = None
-    longitude = None
-    if user.home_location:
-        point = to_shape(user.home_location)
-        latitude = point.y
-        longitude = point.x
+    latitude, longitude = point_lat_lng(user.home_location)
 
     return {
         "id": user.id,
@@ -149,6 +149,19 @@ class FriendRequestUpdate(BaseModel):
     status: str  # accepted, rejected
 
 
+class FriendSuggestionResponse(BaseModel):
+    id: int
+    name: str
+    bio: Optional[str] = None
+    interests: Optional[List[str]] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    mutual_friends_count: int = 0
+    shared_interests_count: int = 0
+    distance_km: Optional[float] = None
+    score: float
+
+
 # Message Schemas
 class MessageCreate(BaseModel):
     activity_id: int
@@ -188,6 +201,17 @@ class NearbyUsersResponse(BaseModel):
         from_attributes = True
 
 
+class UserSearchResponse(BaseModel):
+    id: int
+    name: str
+    bio: Optional[str] = None
+    interests: Optional[List[str]] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None
+    similarity: float
+
+
 # Notification Schemas
 class NotificationItem(BaseModel):
     id: int
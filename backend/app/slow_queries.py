@@ -0,0 +1,209 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.instrumentation import current_sql_stats, statement_shape
+
+logger = logging.getLogger("app.slow_queries")
+
+# Query-urile mai lente de atât sunt înregistrate (0 = dezactivat)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+# Fișierul JSON lines cu query-urile lente (rotit la SLOW_QUERY_LOG_MAX_BYTES)
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "logs/slow_queries.jsonl")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+# Planul unei forme de query este capturat cel mult o dată pe interval (secunde)
+EXPLAIN_INTERVAL_SECONDS = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "600"))
+# EXPLAIN ANALYZE re-execută query-ul (inclusiv funcții volatile din SELECT): doar la cerere explicită
+EXPLAIN_ANALYZE = os.getenv("SLOW_QUERY_EXPLAIN_ANALYZE", "false").lower() in ("1", "true", "yes")
+# Limită de timp pentru captura planului (ms)
+EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "30000"))
+
+# Câte query-uri lente pot aștepta captura; peste limită sunt doar numărate
+QUEUE_SIZE = 100
+# Câte forme distincte de query sunt păstrate în memorie pentru endpoint-ul de admin
+MAX_TRACKED_SHAPES = 200
+
+
+def _is_select(statement: str) -> bool:
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return head in ("SELECT", "WITH") and not any(
+        keyword in statement.upper() for keyword in ("INSERT ", "UPDATE ", "DELETE ", "FOR UPDATE")
+    )
+
+
+def _redact_parameters(parameters):
+    """Doar tipul (și lungimea) fiecărui parametru: valorile pot fi email-uri, hash-uri de parole sau texte"""
+    def describe(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes, list, tuple, dict)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return {key: describe(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [describe(value) for value in parameters]
+    return None
+
+
+class SlowQueryRecorder:
+    """Înregistrează query-urile lente; planul EXPLAIN este capturat pe un thread separat"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS):
+        self.threshold = threshold_ms / 1000.0
+        self.engine = None
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._offenders = {}
+        # forma -> momentul ultimei capturi de plan (folosit doar de thread-ul de captură)
+        self._explained_at = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def install(self, engine: Engine) -> None:
+        if not self.threshold:
+            return
+        self.engine = engine
+        self._configure_log()
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        self._worker = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+        self._worker.start()
+
+    def _configure_log(self) -> None:
+        if SLOW_QUERY_LOG and not logger.handlers:
+            os.makedirs(os.path.dirname(SLOW_QUERY_LOG) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        # Query-urile EXPLAIN ale worker-ului nu sunt înregistrate din nou
+        if duration < self.threshold or executemany or not context.execution_options.get("slow_query_log", True):
+            return
+
+        stats = current_sql_stats()
+        entry = {
+            "recorded_at": datetime.utcnow().isoformat(),
+            "route": stats.route if stats is not None else None,
+            "duration_ms": round(duration * 1000, 1),
+            "statement": statement,
+            "parameters": parameters,
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            entry["shape"] = statement_shape(entry["statement"])
+            if self._should_explain(entry["shape"]):
+                try:
+                    entry["plan"] = self._explain(entry["statement"], entry["parameters"])
+                except Exception as exc:
+                    entry["plan"] = None
+                    entry["explain_error"] = str(exc)
+            # În log și la endpoint-ul de admin ajung doar forma query-ului și tipurile parametrilor
+            entry["parameters"] = _redact_parameters(entry["parameters"])
+            del entry["statement"]
+            self._remember(entry)
+            logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def _should_explain(self, shape: str) -> bool:
+        """O captură de plan per formă per EXPLAIN_INTERVAL_SECONDS (sub încărcare, restul sunt doar numărate)"""
+        now = time.monotonic()
+        last = self._explained_at.get(shape)
+        if last is not None and now - last < EXPLAIN_INTERVAL_SECONDS:
+            return False
+        if len(self._explained_at) >= MAX_TRACKED_SHAPES * 5:
+            self._explained_at = {
+                s: t for s, t in self._explained_at.items() if now - t < EXPLAIN_INTERVAL_SECONDS
+            }
+        self._explained_at[shape] = now
+        return True
+
+    def _explain(self, statement: str, parameters):
+        """Planul estimat al query-ului; cu SLOW_QUERY_EXPLAIN_ANALYZE, ANALYZE doar pentru SELECT,
+        într-o tranzacție care este întotdeauna anulată"""
+        analyze = EXPLAIN_ANALYZE and _is_select(statement)
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        with self.engine.connect().execution_options(slow_query_log=False) as conn:
+            trans = conn.begin()
+            try:
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                result = conn.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters or None)
+                return result.scalar()
+            finally:
+                trans.rollback()
+
+    def _remember(self, entry: dict) -> None:
+        with self._lock:
+            offender = self._offenders.get(entry["shape"])
+            if offender is None:
+                if len(self._offenders) >= MAX_TRACKED_SHAPES:
+                    # Elimină forma cu cea mai mică durată maximă
+                    smallest = min(self._offenders, key=lambda s: self._offenders[s]["max_ms"])
+                    if self._offenders[smallest]["max_ms"] >= entry["duration_ms"]:
+                        return
+                    del self._offenders[smallest]
+                offender = self._offenders[entry["shape"]] = {
+                    "shape": entry["shape"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": [],
+                    "plan": None,
+                }
+            offender["count"] += 1
+            offender["total_ms"] += entry["duration_ms"]
+            offender["last_seen"] = entry["recorded_at"]
+            if entry["route"] and entry["route"] not in offender["routes"]:
+                offender["routes"].append(entry["route"])
+            if "plan" in entry:
+                # Ultimul plan capturat pentru formă (aparițiile din același interval nu au plan)
+                offender["plan"] = entry["plan"]
+                offender["plan_captured_at"] = entry["recorded_at"]
+                offender["explain_error"] = entry.get("explain_error")
+            if entry["duration_ms"] >= offender["max_ms"]:
+                # Exemplul păstrat este cel mai lent
+                offender["max_ms"] = entry["duration_ms"]
+                offender["worst"] = {
+                    "route": entry["route"],
+                    "recorded_at": entry["recorded_at"],
+                    "parameters": entry["parameters"],
+                }
+
+    def worst_offenders(self, limit: int = 20, sort: str = "max") -> list:
+        key = {"max": "max_ms", "total": "total_ms", "count": "count"}[sort]
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda o: o[key], reverse=True)[:limit]
+            return [
+                {**o, "total_ms": round(o["total_ms"], 1), "avg_ms": round(o["total_ms"] / o["count"], 1)}
+                for o in offenders
+            ]
+
+
+slow_query_recorder = SlowQueryRecorder()
@@ -0,0 +1,220 @@
+import math
+from datetime import datetime
+from typing import Iterable
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import FriendSuggestion, FriendSuggestionState, Friendship
+
+# Candidații din apropiere sunt căutați în această rază (km)
+SUGGESTION_RADIUS_KM = 50
+# Câți vecini spațiali sunt luați în calcul per utilizator (limitează orașele dense)
+NEARBY_CANDIDATES_LIMIT = 500
+# Câte sugestii se păstrează per utilizator
+MAX_SUGGESTIONS = 50
+
+# Ponderile componentelor scorului
+WEIGHT_MUTUAL_FRIENDS = 3.0
+WEIGHT_PROXIMITY = 2.0
+WEIGHT_INTERESTS = 1.5
+
+# Prieteni-ai-prietenilor + vecini spațiali, fără prietenii existenți și fără
+# utilizatorii cu care există deja o cerere de prietenie (în orice direcție)
+CANDIDATES_SQL = text("""
+    WITH me AS (
+        SELECT id, home_location FROM users WHERE id = :user_id
+    ),
+    fof AS (
+        SELECT f2.friend_id AS candidate_id, COUNT(*) AS mutual
+        FROM friendships f1
+        JOIN friendships f2 ON f2.user_id = f1.friend_id
+        WHERE f1.user_id = :user_id
+        GROUP BY f2.friend_id
+    ),
+    near AS (
+        SELECT u.id AS candidate_id
+        FROM users u, me
+        WHERE me.home_location IS NOT NULL
+            AND u.home_location IS NOT NULL
+            AND ST_DWithin(u.home_location::geography, me.home_location::geography, :radius_m)
+        ORDER BY u.home_location <-> me.home_location
+        LIMIT :near_limit
+    ),
+    candidates AS (
+        SELECT candidate_id FROM fof
+        UNION
+        SELECT candidate_id FROM near
+    )
+    SELECT
+        c.candidate_id,
+        COALESCE(fof.mutual, 0) AS mutual,
+        ST_Distance(u.home_location::geography, me.home_location::geography) / 1000.0 AS distance_km,
+        u.interests
+    FROM candidates c
+    JOIN users u ON u.id = c.candidate_id
+    CROSS JOIN me
+    LEFT JOIN fof ON fof.candidate_id = c.candidate_id
+    WHERE c.candidate_id <> :user_id
+        AND NOT EXISTS (
+            SELECT 1 FROM friendships f
+            WHERE f.user_id = :user_id AND f.friend_id = c.candidate_id
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM friend_requests fr
+            WHERE (fr.from_user_id = :user_id AND fr.to_user_id = c.candidate_id)
+                OR (fr.from_user_id = c.candidate_id AND fr.to_user_id = :user_id)
+        )
+""")
+
+
+def _normalize_interests(interests) -> set:
+    return {str(i).strip().lower() for i in (interests or []) if str(i).strip()}
+
+
+def score_candidate(mutual: int, distance_km, my_interests: set, candidate_interests: set) -> tuple:
+    """Calculează scorul unui candidat; returnează (scor, număr de interese comune)"""
+    score = WEIGHT_MUTUAL_FRIENDS * math.log1p(mutual)
+
+    if distance_km is not None:
+        score += WEIGHT_PROXIMITY * max(0.0, 1.0 - distance_km / SUGGESTION_RADIUS_KM)
+
+    shared = len(my_interests & candidate_interests)
+    if shared:
+        # Jaccard, ca utilizatorii cu liste lungi de interese să nu fie favorizați
+        score += WEIGHT_INTERESTS * shared / len(my_interests | candidate_interests)
+
+    return score, shared
+
+
+def refresh_user_suggestions(db: Session, user_id: int) -> int:
+    """Recalculează sugestiile de prietenie ale unui utilizator (fără commit)"""
+    my_interests = db.execute(
+        text("SELECT interests FROM users WHERE id = :user_id"), {"user_id": user_id}
+    ).scalar()
+    my_interests = _normalize_interests(my_interests)
+
+    rows = db.execute(CANDIDATES_SQL, {
+        "user_id": user_id,
+        "radius_m": SUGGESTION_RADIUS_KM * 1000,
+        "near_limit": NEARBY_CANDIDATES_LIMIT,
+    }).fetchall()
+
+    now = datetime.utcnow()
+    suggestions = []
+    for row in rows:
+        score, shared = score_candidate(
+            row.mutual, row.distance_km, my_interests, _normalize_interests(row.interests)
+        )
+        if score <= 0:
+            continue
+        suggestions.append({
+            "user_id": user_id,
+            "candidate_id": row.candidate_id,
+            "score": score,
+            "mutual_friends": row.mutual,
+            "shared_interests": shared,
+            "distance_km": row.distance_km,
+            "updated_at": now,
+        })
+
+    suggestions.sort(key=lambda s: s["score"], reverse=True)
+    suggestions = suggestions[:MAX_SUGGESTIONS]
+
+    db.query(FriendSuggestion).filter(FriendSuggestion.user_id == user_id).delete(synchronize_session=False)
+    if suggestions:
+        db.bulk_insert_mappings(FriendSuggestion, suggestions)
+    # Marcajul deosebește "fără candidați" de "necalculat", ca lista goală să nu fie recalculată la fiecare cerere
+    state = insert(FriendSuggestionState).values(user_id=user_id, computed_at=now, stale=False)
+    db.execute(state.on_conflict_do_update(
+        index_elements=["user_id"], set_={"computed_at": now, "stale": False}
+    ))
+    return len(suggestions)
+
+
+def mark_suggestions_stale(db: Session, user_ids: Iterable[int]) -> None:
+    """Marchează sugestiile utilizatorilor pentru recalculare în jobul de mentenanță (fără commit)"""
+    rows = [{"user_id": user_id, "stale": True} for user_id in set(user_ids)]
+    if rows:
+        db.execute(insert(FriendSuggestionState).values(rows).on_conflict_do_update(
+            index_elements=["user_id"], set_={"stale": True}
+        ))
+
+
+def needs_suggestions(db: Session, user_id: int) -> bool:
+    """Sugestiile utilizatorului nu au fost calculate niciodată sau sunt marcate ca învechite"""
+    state = db.query(FriendSuggestionState.stale).filter(FriendSuggestionState.user_id == user_id).first()
+    return state is None or state.stale
+
+
+def drop_suggestion_pair(db: Session, user_id: int, other_id: int) -> None:
+    """Elimină sugestia dintre doi utilizatori, în ambele direcții (fără commit)"""
+    db.query(FriendSuggestion).filter(
+        ((FriendSuggestion.user_id == user_id) & (FriendSuggestion.candidate_id == other_id)) |
+        ((FriendSuggestion.user_id == other_id) & (FriendSuggestion.candidate_id == user_id))
+    ).delete(synchronize_session=False)
+
+
+def affected_by_friendship_change(db: Session, user_id: int, friend_id: int) -> set:
+    """Utilizatorii ale căror sugestii se schimbă când (user_id, friend_id) devin/nu mai sunt prieteni"""
+    # Prietenii-comuni se modifică pentru cei doi și pentru prietenii fiecăruia
+    friend_ids = db.query(Friendship.friend_id).filter(
+        Friendship.user_id.in_([user_id, friend_id])
+    ).all()
+    return {user_id, friend_id} | {fid for (fid,) in friend_ids}
+
+
+def affected_by_profile_change(db: Session, user_id: int) -> set:
+    """Utilizatorii ale căror sugestii depind de locația/interesele lui user_id"""
+    rows = db.query(FriendSuggestion.user_id).filter(
+        FriendSuggestion.candidate_id == user_id
+    ).all()
+    return {user_id} | {uid for (uid,) in rows}
+
+
+def refresh_suggestions_in_background(user_ids: Iterable[int]) -> None:
+    """Recalculează sugestiile pentru mai mulți utilizatori, într-o sesiune proprie (BackgroundTasks)"""
+    db = SessionLocal()
+    try:
+        for user_id in user_ids:
+            refresh_user_suggestions(db, user_id)
+            db.commit()
+    finally:
+        db.close()
+
+
+def refresh_all_suggestions(db: Session, batch_size: int = 500) -> dict:
+    """Recalculează sugestiile pentru toți utilizatorii, în loturi"""
+    refreshed = 0
+    last_id = 0
+    while True:
+        user_ids = [uid for (uid,) in db.execute(
+            text("SELECT id FROM users WHERE id > :last_id ORDER BY id LIMIT :batch_size"),
+            {"last_id": last_id, "batch_size": batch_size}
+        ).fetchall()]
+        if not user_ids:
+            break
+        for user_id in user_ids:
+            refresh_user_suggestions(db, user_id)
+        db.commit()
+        refreshed += len(user_ids)
+        last_id = user_ids[-1]
+    return {"users": refreshed}
+
+
+def refresh_stale_suggestions(db: Session, batch_size: int = 500) -> dict:
+    """Recalculează sugestiile marcate ca învechite (ex. prietenii celor care au devenit prieteni), în loturi"""
+    refreshed = 0
+    last_id = 0
+    while True:
+        user_ids = [uid for (uid,) in db.query(FriendSuggestionState.user_id).filter(
+            FriendSuggestionState.stale, FriendSuggestionState.user_id > last_id
+        ).order_by(FriendSuggestionState.user_id).limit(batch_size).all()]
+        if not user_ids:
+            break
+        for user_id in user_ids:
+            refresh_user_suggestions(db, user_id)
+        db.commit()
+        refreshed += len(user_ids)
+        last_id = user_ids[-1]
+    return {"users": refreshed}
@@ -0,0 +1,97 @@
+"""
+Timpul de pornire al unui worker: importul aplicației și lifespan-ul (pool încălzit).
+
+Importul este măsurat cu `python -X importtime` într-un proces nou (fără cache-uri
+de import din procesul curent); sunt afișate pachetele cu cel mai mare timp propriu
+(suma modulelor lor, fără importurile altor pachete făcute de ele). Lifespan-ul rulează cu TestClient și necesită baza de date.
+
+Rulare (din directorul backend):
+    python -m benchmarks.startup                   # import + lifespan
+    python -m benchmarks.startup --import-only     # fără baza de date
+    python -m benchmarks.startup --max-import-ms 1500   # eșuează peste buget
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+LIFESPAN_SNIPPET = """
+import time
+started = time.perf_counter()
+from main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    ready = time.perf_counter()
+    status = client.get("/api/health/ready").status_code
+print(f"{(imported - started) * 1000:.1f} {(ready - imported) * 1000:.1f} {status}")
+"""
+
+
+def measure_imports() -> tuple:
+    """(total ms, [(pachet, ms propriu)]) pentru `import main`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit("Importul aplicației a eșuat")
+
+    packages = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[1].strip().isdigit():
+            continue
+        # Numele este precedat de un spațiu, plus câte două pentru fiecare nivel de import imbricat
+        own, cumulative, name = int(parts[0]), int(parts[1]), parts[2][1:]
+        # Doar importurile de nivel superior (fără indentare) se adună la total
+        if not name.startswith(" "):
+            total_us += cumulative
+        # Timpii proprii se adună fără dublări, deci fiecare pachet primește doar timpul modulelor lui
+        top = name.strip().split(".")[0]
+        packages[top] = packages.get(top, 0) + own
+    ranking = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return total_us / 1000, [(name, us / 1000) for name, us in ranking]
+
+
+def measure_lifespan() -> tuple:
+    """(import ms, lifespan ms, status readiness) într-un proces nou"""
+    result = subprocess.run(
+        [sys.executable, "-c", LIFESPAN_SNIPPET], cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit("Pornirea aplicației a eșuat")
+    imported, lifespan, status = result.stdout.split()[-3:]
+    return float(imported), float(lifespan), int(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Timpul de pornire al aplicației")
+    parser.add_argument("--import-only", action="store_true", help="doar timpul de import")
+    parser.add_argument("--top", type=int, default=15, help="câte pachete sunt afișate")
+    parser.add_argument("--max-import-ms", type=float, help="bugetul pentru importul aplicației")
+    args = parser.parse_args()
+
+    total_ms, ranking = measure_imports()
+    print(f"import main: {total_ms:.1f} ms")
+    for name, ms in ranking[:args.top]:
+        print(f"  {name:<28} {ms:8.1f} ms")
+
+    if not args.import_only:
+        _, lifespan, status = measure_lifespan()
+        print(f"lifespan (mapper-e + pool): {lifespan:.1f} ms, readiness: {status}")
+
+    if args.max_import_ms is not None and total_ms > args.max_import_ms:
+        print(f"FAIL: importul depășește bugetul de {args.max_import_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
-from app.routers import auth, users, activities, participations, friends, messages, search, statistics
+from app.database import engine
+from app.routers import auth, users, activities, participations, friends, messages, search, statistics, admin, health
+from app.instrumentation import install_sql_instrumentation, SqlInstrumentationMiddleware
+from app.slow_queries import slow_query_recorder
+from app.metrics import MetricsMiddleware, install_db_metrics, metrics_payload
+from app.profiling import ProfilingMiddleware
+from app.logging_config import configure_logging
+from app.lifecycle import lifespan
 from starlette.applications import Starlette
 
-# Creează tabelele în baza de date
-Base.metadata.create_all(bind=engine)
+# Logging structurat (JSON, non-blocant); nivelul și sampling-ul din LOG_LEVEL / LOG_SAMPLE_RATE
+configure_logging()
 
 app = FastAPI(
     title="SocialExplore API",
     description="API pentru platforma SocialExplore - conectare persoane și organizare activități locale",
-    version="1.1.0"
+    version="1.1.0",
+    # Schema este gestionată doar de alembic; la pornire se încălzește pool-ul de conexiuni
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -23,6 +31,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Numărul și durata query-urilor SQL per cerere (header Server-Timing + log, detector N+1)
+install_sql_instrumentation(engine)
+app.add_middleware(SqlInstrumentationMiddleware)
+# Query-urile peste SLOW_QUERY_MS sunt logate cu planul EXPLAIN (vezi /api/admin/slow-queries)
+slow_query_recorder.install(engine)
+# Metrici Prometheus: rute, pool DB, instrucțiuni SQL, bcrypt, cache-uri (GET /metrics)
+install_db_metrics(engine)
+app.add_middleware(MetricsMiddleware, fastapi_app=app)
+# Profilare la cerere: header X-Profile (admin) sau PROFILE_SAMPLE_RATE (vezi /api/admin/profiles)
+app.add_middleware(ProfilingMiddleware)
+
 static_app = Starlette()
 static_app.add_middleware(
     CORSMiddleware,
@@ -51,6 +70,8 @@ app.include_router(friends.router, prefix="/api/friends", tags=["friends"])
 app.include_router(messages.router, prefix="/api/messages", tags=["messages"])
 app.include_router(search.router, prefix="/api/search", tags=["search"])
 app.include_router(statistics.router, prefix="/api/statistics", tags=["statistics"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+app.include_router(health.router, prefix="/api/health", tags=["health"])
 
 
 @app.get("/")
@@ -62,7 +83,14 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = metrics_payload()
+    return Response(content=content, media_type=content_type)
+
+
 @app.get("/api/health")
 async def health_check():
+    # Păstrat pentru compatibilitate; probele folosesc /api/health/live și /api/health/ready
     return {"status": "healthy"}
 
@@ -128,6 +128,20 @@ const FriendsList = ({ onClose, userLocation, initialTab, onUpdate }) => {
     }
   };
 
+  // Sugestii precalculate pe server (prieteni comuni, apropiere, interese)
+  const handleLoadSuggestions = async () => {
+    setSearchLoading(true);
+    try {
+      const response = await api.get('/api/friends/suggestions');
+      setSearchResults(response.data || []);
+    } catch (error) {
+      console.error('Eroare la încărcarea sugestiilor:', error);
+      setSearchResults([]);
+    } finally {
+      setSearchLoading(false);
+    }
+  };
+
   const handleSendFriendRequest = async (toUserId) => {
     setLoading(true);
     try {
@@ -177,7 +191,7 @@ const FriendsList = ({ onClose, userLocation, initialTab, onUpdate }) => {
             onClick={() => {
               setActiveTab('search');
               if (searchResults.length === 0 && !searchLoading) {
-                handleSearchUsers();
+                handleLoadSuggestions();
               }
             }}
           >
@@ -321,6 +335,11 @@ const FriendsList = ({ onClose, userLocation, initialTab, onUpdate }) => {
                               📍 {user.distance_km.toFixed(1)} km distanță
                             </p>
                           )}
+                          {user.mutual_friends_count > 0 && (
+                            <p className="user-distance">
+                              👥 {user.mutual_friends_count} prieteni comuni
+                            </p>
+                          )}
                         </div>
                         <div className="user-actions">
                           {status === 'friend' && (
@@ -0,0 +1,106 @@
+"""
+Verifică stratul de cache (app/cache.py) pe ambele backend-uri.
+
+Backend-ul Redis este verificat față de resp_standin.py, pornit în proces pe un port liber:
+hit/miss, invalidarea prin tag-uri (inclusiv tag-uri calculate din valoare), TTL și
+protecția la stampede (cereri simultane pe aceeași cheie => un singur calcul) și citirile în lot.
+
+Rulare (din directorul tools, cu dependențele backend-ului instalate):
+    python cache_check.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from resp_standin import serve_in_thread  # noqa: E402
+from app.cache import Cache, MemoryCacheBackend, RedisCacheBackend, invalidate_tags  # noqa: E402
+import app.cache  # noqa: E402
+
+CONCURRENT_CALLERS = 8
+
+
+def check(backend, label: str) -> list:
+    # invalidate_tags scrie în backend-ul global: îl înlocuim pe durata verificării
+    app.cache.cache_backend = backend
+    cache = Cache(f"check_{label}", ttl_seconds=60, backend=backend, value_tag_families=("user:*",))
+    cache.clear()
+    failures = []
+
+    def expect(condition: bool, message: str):
+        print(f"  [{'OK' if condition else 'FAIL'}] {message}")
+        if not condition:
+            failures.append(f"{label}: {message}")
+
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"computed": len(calls)}
+
+    threads = [threading.Thread(target=cache.get_or_set, args=("stats", load), kwargs={"tags": ("activities",)})
+               for _ in range(CONCURRENT_CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    expect(len(calls) == 1, f"{CONCURRENT_CALLERS} cereri simultane => {len(calls)} calcul(e)")
+    expect(cache.get("stats") == {"computed": 1}, "hit după calcul")
+
+    invalidate_tags("activities")
+    expect(cache.get("stats") is None, "tag invalidat => miss")
+    expect(cache.get_or_set("stats", load, tags=("activities",)) == {"computed": 2}, "recalculat după invalidare")
+
+    cache.get_or_set("messages", lambda: [{"sender_id": 7}],
+                     value_tags=lambda result: {f"user:{m['sender_id']}" for m in result})
+    invalidate_tags("user:8")
+    expect(cache.get("messages") is not None, "tag fără legătură => hit")
+    invalidate_tags("user:7")
+    expect(cache.get("messages") is None, "tag din valoare invalidat => miss")
+
+    def load_during_rename():
+        # Profilul expeditorului se schimbă după ce lista a fost citită, înainte de scrierea în cache
+        result = [{"sender_id": 7}]
+        invalidate_tags("user:7")
+        return result
+
+    cache.get_or_set("renamed", load_during_rename,
+                     value_tags=lambda result: {f"user:{m['sender_id']}" for m in result})
+    expect(cache.get("renamed") is None, "tag din valoare schimbat în timpul calculului => nu este scris")
+
+    cache.set("short", 1, ttl_seconds=0.1)
+    time.sleep(0.2)
+    expect(cache.get("short") is None, "TTL expirat => miss")
+
+    cache.set(("grid", 1.5, 2.5), "x")
+    cache.delete(("grid", 1.5, 2.5))
+    expect(cache.get(("grid", 1.5, 2.5)) is None, "delete")
+
+    cache.set_many({1: "a", 2: "b"})
+    expect(cache.get_many([1, 2, 3]) == {1: "a", 2: "b"}, "get_many => doar intrările găsite")
+    cache.delete(2)
+    expect(cache.get_many([1, 2]) == {1: "a"}, "get_many după delete")
+    return failures
+
+
+def main():
+    server = serve_in_thread()
+    host, port = server.server_address
+    failures = []
+    print("memory")
+    failures += check(MemoryCacheBackend(), "memory")
+    print(f"redis (stand-in pe {host}:{port})")
+    failures += check(RedisCacheBackend(f"redis://{host}:{port}/0"), "redis")
+    server.shutdown()
+
+    if failures:
+        print(f"\n{len(failures)} verificări eșuate")
+        sys.exit(1)
+    print("\nToate verificările au trecut")
+
+
+if __name__ == "__main__":
+    main()
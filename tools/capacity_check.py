@@ -0,0 +1,96 @@
+"""
+Verifică limita max_people sub accept-uri concurente.
+
+Creează un creator, o activitate cu max_people=CAP_MAX_PEOPLE și CAP_JOINERS
+utilizatori care cer să participe, apoi trimite toate accept-urile în paralel.
+Limita este respectată dacă exact CAP_MAX_PEOPLE accept-uri reușesc și
+participants_count al activității este egal cu CAP_MAX_PEOPLE.
+
+Rulare (cu backend-ul pornit):
+    python capacity_check.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+BASE_URL = os.getenv("SEED_BASE_URL", "http://localhost:8000").rstrip("/")
+JOINERS = int(os.getenv("CAP_JOINERS", "300"))
+MAX_PEOPLE = int(os.getenv("CAP_MAX_PEOPLE", "10"))
+WORKERS = int(os.getenv("CAP_WORKERS", "64"))
+
+RUN_ID = time.strftime("CAP_%Y%m%dT%H%M%S")
+TAG = f"__FAKE__{RUN_ID}"
+
+
+def register(session: requests.Session, i: int) -> tuple[str, int]:
+    email = f"cap{i}{TAG}@example.com"
+    r = session.post(f"{BASE_URL}/api/auth/register", json={
+        "name": f"Capacity {i}",
+        "email": email,
+        "password": "pass1234",
+    }, timeout=30)
+    r.raise_for_status()
+    data = r.json()
+    return data["access_token"], data["user"]["id"]
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+
+
+def main():
+    session = requests.Session()
+    creator_token, _ = register(session, 0)
+
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    r = session.post(f"{BASE_URL}/api/activities/", json={
+        "title": "Capacity check",
+        "category": "other",
+        "start_time": start.isoformat(),
+        "latitude": 44.4268,
+        "longitude": 26.1025,
+        "max_people": MAX_PEOPLE,
+        "is_public": True,
+    }, headers=auth(creator_token), timeout=30)
+    r.raise_for_status()
+    activity_id = r.json()["id"]
+
+    def join(i: int) -> int:
+        token, _ = register(requests.Session(), i)
+        r = requests.post(f"{BASE_URL}/api/participations/", json={"activity_id": activity_id},
+                          headers=auth(token), timeout=30)
+        r.raise_for_status()
+        return r.json()["id"]
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        participation_ids = list(pool.map(join, range(1, JOINERS + 1)))
+
+    def accept(participation_id: int) -> int:
+        r = requests.put(f"{BASE_URL}/api/participations/{participation_id}", json={"status": "accepted"},
+                         headers=auth(creator_token), timeout=60)
+        return r.status_code
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        statuses = list(pool.map(accept, participation_ids))
+
+    accepted = statuses.count(200)
+    rejected_full = statuses.count(400)
+    activity = session.get(f"{BASE_URL}/api/activities/{activity_id}", headers=auth(creator_token), timeout=30).json()
+
+    print(f"[+] activity {activity_id}: max_people={MAX_PEOPLE}, accepts sent={len(statuses)}")
+    print(f"[+] accepted={accepted}, full={rejected_full}, other={len(statuses) - accepted - rejected_full}")
+    print(f"[+] participants_count={activity.get('participants_count')}")
+    print(f"[Info] Fake users tagged with {TAG} (use clean.sql for cleanup)")
+
+    if accepted != MAX_PEOPLE or activity.get("participants_count") != MAX_PEOPLE:
+        print("[!] capacity violated")
+        sys.exit(1)
+    print("[Success] capacity held")
+
+
+if __name__ == "__main__":
+    main()
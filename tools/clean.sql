@@ -15,6 +15,13 @@ WHERE user_id IN (SELECT id FROM tmp_fake_users)
                                             WHERE from_user_id IN (SELECT id FROM tmp_fake_users)
                                                                 OR to_user_id   IN (SELECT id FROM tmp_fake_users));
 
+-- 1.1) Message read marks (references users + activities)
+DELETE FROM message_read_marks
+WHERE user_id IN (SELECT id FROM tmp_fake_users)
+                OR sender_id IN (SELECT id FROM tmp_fake_users)
+                OR activity_id IN (SELECT id FROM activities
+                                    WHERE creator_id IN (SELECT id FROM tmp_fake_users));
+
 -- 2) Messages (references activities + sender user)
 DELETE FROM messages
 WHERE sender_id IN (SELECT id FROM tmp_fake_users)
@@ -32,6 +39,11 @@ DELETE FROM friend_requests
 WHERE from_user_id IN (SELECT id FROM tmp_fake_users)
                     OR to_user_id IN (SELECT id FROM tmp_fake_users);
 
+-- 4.1) Friendships (references users)
+DELETE FROM friendships
+WHERE user_id IN (SELECT id FROM tmp_fake_users)
+                    OR friend_id IN (SELECT id FROM tmp_fake_users);
+
 -- 5) Activities created by fake users
 DELETE FROM activities
 WHERE creator_id IN (SELECT id FROM tmp_fake_users);
@@ -0,0 +1,285 @@
+"""
+Generator de încărcare: mulți utilizatori simulați în paralel (asyncio + httpx).
+
+Fiecare utilizator virtual rulează o sesiune realistă până la expirarea duratei:
+pan-uri pe hartă (/api/activities/nearby), polling de chat la 5s, polling de
+notificări la 10s, cereri de participare, accept-uri (ca organizator) și mesaje.
+La final afișează throughput-ul și p50/p95/p99 per endpoint.
+
+Utilizatorii sunt fie cei dintr-un ledger scris de seed.py (LOAD_LEDGER), fie
+utilizatori noi înregistrați la pornire (tag __FAKE__, șterși de clean.sql).
+
+Rulare (cu backend-ul pornit):
+    python loadgen.py
+    SEED_MODE=load python seed.py
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from seed import BASE_URL, CITIES, CATEGORIES, TITLES, DESCRIPTIONS, jitter_latlon
+
+USERS = int(os.getenv("LOAD_USERS", "100"))
+DURATION = float(os.getenv("LOAD_DURATION", "60"))
+LEDGER_PATH = os.getenv("LOAD_LEDGER")
+# parallel registrations/logins at startup (bcrypt is the bottleneck there)
+SETUP_CONCURRENCY = int(os.getenv("LOAD_SETUP_CONCURRENCY", "16"))
+
+CHAT_POLL_SECONDS = float(os.getenv("LOAD_CHAT_POLL", "5"))
+NOTIFICATIONS_POLL_SECONDS = float(os.getenv("LOAD_NOTIFICATIONS_POLL", "10"))
+# pause between two user actions (seconds)
+THINK_MIN = float(os.getenv("LOAD_THINK_MIN", "1"))
+THINK_MAX = float(os.getenv("LOAD_THINK_MAX", "5"))
+
+# probabilities of each action after a map pan
+JOIN_PROBABILITY = float(os.getenv("LOAD_JOIN_PROBABILITY", "0.15"))
+CREATE_PROBABILITY = float(os.getenv("LOAD_CREATE_PROBABILITY", "0.03"))
+MESSAGE_PROBABILITY = float(os.getenv("LOAD_MESSAGE_PROBABILITY", "0.1"))
+
+random.seed(int(os.getenv("LOAD_RAND", "123")))
+
+RUN_ID = os.getenv("SEED_RUN_ID", time.strftime("LOAD_%Y%m%dT%H%M%S"))
+TAG = f"__FAKE__{RUN_ID}"
+
+
+class Stats:
+    """Latențe și statusuri per endpoint (șablon de rută, nu URL concret)"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        total = sum(len(v) for v in self.latencies.values())
+        print(f"\n[+] {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+        print(f"{'endpoint':<48} {'count':>7} {'req/s':>7} {'err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for endpoint in sorted(self.latencies, key=lambda e: -len(self.latencies[e])):
+            values = sorted(self.latencies[endpoint])
+            print(
+                f"{endpoint:<48} {len(values):>7} {len(values) / elapsed:>7.1f} {self.errors.get(endpoint, 0):>5} "
+                f"{percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f} "
+                f"{percentile(values, 99) * 1000:>8.1f}"
+            )
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, token: str, user_id: int, lat: float, lon: float):
+        self.client = client
+        self.stats = stats
+        self.headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+        self.user_id = user_id
+        self.home = (lat, lon)
+        self.view = (lat, lon)
+        # activities where this user can read/write chat (created or accepted)
+        self.chat_activity_ids = set()
+
+    async def call(self, method: str, endpoint: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(endpoint, time.perf_counter() - started, False)
+            return None
+        self.stats.record(endpoint, time.perf_counter() - started, r.status_code < 400)
+        return r
+
+    async def pan_map(self) -> list:
+        # small pans around the current view, sometimes jump back home
+        if random.random() < 0.1:
+            self.view = self.home
+        self.view = jitter_latlon(*self.view, km=3.0)
+        r = await self.call(
+            "GET", "GET /api/activities/nearby", "/api/activities/nearby",
+            params={"latitude": self.view[0], "longitude": self.view[1], "radius_km": random.choice([5, 10, 25])}
+        )
+        return r.json() if r is not None and r.status_code == 200 else []
+
+    async def join(self, activities: list) -> None:
+        candidates = [
+            a for a in activities
+            if a.get("creator_id") != self.user_id
+            and (a.get("max_people") is None or (a.get("participants_count") or 0) < a["max_people"])
+        ]
+        if candidates:
+            await self.call("POST", "POST /api/participations/", "/api/participations/",
+                            json={"activity_id": random.choice(candidates)["id"]})
+
+    async def create_activity(self) -> None:
+        start = datetime.now(timezone.utc) + timedelta(days=random.randint(0, 14), hours=random.randint(0, 23))
+        lat, lon = jitter_latlon(*self.home, km=2.0)
+        r = await self.call("POST", "POST /api/activities/", "/api/activities/", json={
+            "title": random.choice(TITLES),
+            "description": random.choice(DESCRIPTIONS),
+            "category": random.choice(CATEGORIES),
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=2)).isoformat(),
+            "latitude": lat,
+            "longitude": lon,
+            "max_people": random.randint(5, 30),
+            "is_public": True,
+        })
+        if r is not None and r.status_code == 201:
+            self.chat_activity_ids.add(r.json()["id"])
+
+    async def send_message(self) -> None:
+        if self.chat_activity_ids:
+            await self.call("POST", "POST /api/messages/", "/api/messages/", json={
+                "activity_id": random.choice(list(self.chat_activity_ids)),
+                "text": random.choice(["Salut!", "Ne vedem acolo", "Cine mai vine?", "Perfect, mersi!"]),
+            })
+
+    async def browse(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            activities = await self.pan_map()
+            roll = random.random()
+            if roll < JOIN_PROBABILITY:
+                await self.join(activities)
+            elif roll < JOIN_PROBABILITY + CREATE_PROBABILITY:
+                await self.create_activity()
+            elif roll < JOIN_PROBABILITY + CREATE_PROBABILITY + MESSAGE_PROBABILITY:
+                await self.send_message()
+            await asyncio.sleep(random.uniform(THINK_MIN, THINK_MAX))
+
+    async def poll_chat(self, deadline: float) -> None:
+        # the open chat window polls every CHAT_POLL_SECONDS
+        await asyncio.sleep(random.uniform(0, CHAT_POLL_SECONDS))
+        while time.perf_counter() < deadline:
+            if self.chat_activity_ids:
+                activity_id = random.choice(list(self.chat_activity_ids))
+                await self.call("GET", "GET /api/messages/activity/{id}", f"/api/messages/activity/{activity_id}")
+            await asyncio.sleep(CHAT_POLL_SECONDS)
+
+    async def poll_notifications(self, deadline: float) -> None:
+        # the badge polls the count; the list (and accepts, as organizer) only when there is something new
+        await asyncio.sleep(random.uniform(0, NOTIFICATIONS_POLL_SECONDS))
+        while time.perf_counter() < deadline:
+            r = await self.call("GET", "GET /api/participations/notifications/count",
+                                "/api/participations/notifications/count")
+            if r is not None and r.status_code == 200 and r.json().get("count"):
+                await self.handle_notifications()
+            await asyncio.sleep(NOTIFICATIONS_POLL_SECONDS)
+
+    async def handle_notifications(self) -> None:
+        r = await self.call("GET", "GET /api/participations/notifications", "/api/participations/notifications")
+        if r is None or r.status_code != 200:
+            return
+        for n in r.json().get("notifications", []):
+            if n["type"] == "participation_request":
+                accepted = await self.call("PUT", "PUT /api/participations/{id}", f"/api/participations/{n['id']}",
+                                           json={"status": "accepted"})
+                if accepted is not None and accepted.status_code == 200:
+                    self.chat_activity_ids.add(n["activity_id"])
+            elif n["type"] == "new_message":
+                await self.call(
+                    "POST", "POST /api/participations/notifications/{type}/{id}/read",
+                    f"/api/participations/notifications/new_message/{n['id']}/read"
+                )
+
+    async def run(self, deadline: float) -> None:
+        await asyncio.gather(
+            self.browse(deadline),
+            self.poll_chat(deadline),
+            self.poll_notifications(deadline),
+        )
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str):
+    r = await client.post("/api/auth/login", json={"email": email, "password": password})
+    if r.status_code != 200:
+        print(f"[!] login failed {email}: {r.status_code}")
+        return None
+    data = r.json()
+    return data["access_token"], data["user"]["id"]
+
+
+async def register(client: httpx.AsyncClient, i: int, city: str):
+    email = f"load{i}{TAG}@example.com"
+    r = await client.post("/api/auth/register", json={
+        "name": f"Load {city} {i}",
+        "email": email,
+        "bio": f"Fake user for load testing ({city})",
+        "interests": random.sample(["sport", "food", "games", "volunteer", "music", "tech"], 2),
+        "password": "pass1234",
+    })
+    if r.status_code not in (200, 201):
+        print(f"[!] register failed {email}: {r.status_code}")
+        return None
+    data = r.json()
+    return data["access_token"], data["user"]["id"]
+
+
+async def setup_users(client: httpx.AsyncClient, stats: Stats) -> list:
+    semaphore = asyncio.Semaphore(SETUP_CONCURRENCY)
+
+    if LEDGER_PATH:
+        with open(LEDGER_PATH, encoding="utf-8") as f:
+            ledger_users = json.load(f)["users"][:USERS]
+        specs = [(u["lat"], u["lon"], u["email"], u["password"], None) for u in ledger_users]
+    else:
+        specs = []
+        for i in range(USERS):
+            city = random.choice(list(CITIES.keys()))
+            lat, lon = jitter_latlon(*CITIES[city], km=5.0)
+            specs.append((lat, lon, None, None, (i, city)))
+
+    async def one(spec):
+        lat, lon, email, password, new_user = spec
+        async with semaphore:
+            auth = await (register(client, *new_user) if new_user else login(client, email, password))
+        if auth is None:
+            return None
+        token, user_id = auth
+        # home location is needed by /recommended and the nearby-user search
+        await client.put("/api/users/me", json={"latitude": lat, "longitude": lon},
+                         headers={"Authorization": f"Bearer {token}"})
+        return VirtualUser(client, stats, token, user_id, lat, lon)
+
+    users = await asyncio.gather(*(one(spec) for spec in specs))
+    return [u for u in users if u is not None]
+
+
+async def run() -> None:
+    limits = httpx.Limits(max_connections=max(10, USERS), max_keepalive_connections=max(10, USERS))
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30, limits=limits) as client:
+        stats = Stats()
+        users = await setup_users(client, stats)
+        print(f"[+] {len(users)} virtual users ready in {time.perf_counter() - stats.started:.1f}s")
+
+        # setup calls are not recorded; throughput is measured over the session phase only
+        stats.started = time.perf_counter()
+        deadline = stats.started + DURATION
+        await asyncio.gather(*(u.run(deadline) for u in users))
+        stats.report()
+
+
+def main():
+    print(f"[+] BASE_URL: {BASE_URL}")
+    print(f"[+] Users: {USERS}, duration: {DURATION:.0f}s, ledger: {LEDGER_PATH or '-'}")
+    asyncio.run(run())
+    if not LEDGER_PATH:
+        print(f"[Info] Fake users tagged with {TAG} (use clean.sql for cleanup)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Server minimal compatibil cu protocolul Redis (RESP2), în memorie.
+
+Implementează doar comenzile folosite de backend-ul de cache (GET, SET cu EX/PX/NX/XX, MGET,
+DEL, INCR/INCRBY, EXPIRE/PEXPIRE, SCAN, FLUSHDB, PING, HELLO 2), suficient pentru a rula API-ul cu
+CACHE_BACKEND=redis fără un Redis real. Nu suportă scripturi Lua (rate limiting-ul cu
+RATE_LIMIT_BACKEND=redis are nevoie de Redis).
+
+Rulare:
+    python resp_standin.py
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://localhost:6390/0 uvicorn main:app
+"""
+import fnmatch
+import os
+import socketserver
+import threading
+import time
+
+HOST = os.getenv("RESP_HOST", "127.0.0.1")
+PORT = int(os.getenv("RESP_PORT", "6390"))
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Store:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def execute(self, args: list):
+        command = args[0].decode().upper()
+        handler = getattr(self, "cmd_" + command.lower(), None)
+        if handler is None:
+            return ProtocolError(f"ERR unknown command '{command}'")
+        with self._lock:
+            try:
+                return handler(*args[1:])
+            except (TypeError, ValueError):
+                return ProtocolError(f"ERR wrong arguments for '{command}'")
+
+    def cmd_ping(self, message=None):
+        return message if message is not None else "PONG"
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_client(self, *args):
+        # redis-py trimite CLIENT SETINFO la conectare
+        return "OK"
+
+    def cmd_select(self, index):
+        return "OK"
+
+    def cmd_hello(self, version=b"2", *args):
+        # Doar RESP2; clienții care cer RESP3 primesc NOPROTO
+        if int(version) != 2:
+            return ProtocolError("NOPROTO unsupported protocol version")
+        return [b"server", b"resp-standin", b"version", b"7.0.0", b"proto", 2, b"mode", b"standalone"]
+
+    def cmd_get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        expires_at, nx, xx = None, False, False
+        options = [o.decode().upper() if isinstance(o, bytes) else o for o in options]
+        i = 0
+        while i < len(options):
+            if options[i] in ("EX", "PX"):
+                amount = float(options[i + 1])
+                expires_at = time.monotonic() + (amount if options[i] == "EX" else amount / 1000)
+                i += 2
+            elif options[i] == "NX":
+                nx, i = True, i + 1
+            elif options[i] == "XX":
+                xx, i = True, i + 1
+            else:
+                raise ValueError(options[i])
+        exists = self._live(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._data[key] = (value, expires_at)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return sum(1 for key in keys if self._live(key) is not None and self._data.pop(key))
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._live(key) is not None)
+
+    def cmd_incrby(self, key, amount):
+        entry = self._live(key)
+        value = (int(entry[0]) if entry else 0) + int(amount)
+        self._data[key] = (str(value).encode(), entry[1] if entry else None)
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_pexpire(self, key, milliseconds):
+        entry = self._live(key)
+        if entry is None:
+            return 0
+        self._data[key] = (entry[0], time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def cmd_expire(self, key, seconds):
+        return self.cmd_pexpire(key, int(seconds) * 1000)
+
+    def cmd_scan(self, cursor, *options):
+        # Un singur pas: toate cheile potrivite, cursor 0
+        pattern = b"*"
+        for i in range(0, len(options) - 1, 2):
+            if options[i].decode().upper() == "MATCH":
+                pattern = options[i + 1]
+        keys = [key for key in list(self._data) if self._live(key) is not None
+                and fnmatch.fnmatchcase(key.decode("latin-1"), pattern.decode("latin-1"))]
+        return [b"0", keys]
+
+    def cmd_keys(self, pattern):
+        return self.cmd_scan(b"0", b"MATCH", pattern)[1]
+
+    def cmd_flushdb(self, *args):
+        self._data.clear()
+        return "OK"
+
+    cmd_flushall = cmd_flushdb
+
+
+def encode(value) -> bytes:
+    if isinstance(value, ProtocolError):
+        return b"-" + str(value).encode() + b"\r\n"
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, int):
+        return b":" + str(value).encode() + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+    return b"*" + str(len(value)).encode() + b"\r\n" + b"".join(encode(item) for item in value)
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Comandă inline (ex. din telnet)
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            header = self.rfile.readline()
+            if not header.startswith(b"$"):
+                raise ProtocolError("ERR protocol error")
+            length = int(header[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                args = self.read_command()
+            except (ProtocolError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+            self.wfile.write(encode(store.execute(args)))
+            self.wfile.flush()
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, Handler)
+        self.store = Store()
+
+
+def serve_in_thread(host: str = HOST, port: int = 0) -> StandInServer:
+    """Pornește serverul într-un thread (port 0 = port liber); adresa este în server.server_address"""
+    server = StandInServer((host, port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    server = StandInServer((HOST, PORT))
+    print(f"RESP stand-in pe redis://{HOST}:{PORT}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
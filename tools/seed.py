@@ -297,6 +297,17 @@ def accept_participation(session: requests.Session, creator_token: str, particip
 
 
 def main():
+    # SEED_MODE=bulk: write straight to PostGIS with COPY (see bulk_seed.py)
+    if os.getenv("SEED_MODE", "api") == "bulk":
+        from bulk_seed import main as bulk_main
+        bulk_main()
+        return
+    # SEED_MODE=load: concurrent simulated sessions against the API (see loadgen.py)
+    if os.getenv("SEED_MODE", "api") == "load":
+        from loadgen import main as load_main
+        load_main()
+        return
+
     print(f"[+] BASE_URL: {BASE_URL}")
     print(f"[+] RUN_ID: {RUN_ID}")
     print(f"[+] Creating users: Bucharest={BUCHAREST_USERS}, Rest={REST_USERS}")